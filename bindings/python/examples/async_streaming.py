@@ -8,11 +8,12 @@ This example demonstrates:
 - Using asyncio for concurrent operations
 """
 
+import io
 import sys
 import asyncio
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-from luup_agent import Model, Agent
+from luup_agent import Model, Agent, ModelNotFoundError
 
 
 async def stream_response(agent: Agent, message: str) -> str:
@@ -26,19 +27,35 @@ async def stream_response(agent: Agent, message: str) -> str:
     Returns:
         Full generated response
     """
-    print("Assistant: ", end='', flush=True)
-    
-    tokens = []
-    async for token in agent.generate_async(message):
-        print(token, end='', flush=True)
-        tokens.append(token)
+    # Accumulate into one growing buffer instead of a list to join later
+    response = io.StringIO()
+    n_tokens = 0
     
+    print("Assistant: ", end='', flush=True)
+    # Write to the raw stdout buffer and flush on newlines or every
+    # 64 tokens rather than issuing a write() syscall per token
+    out = sys.stdout.buffer
+    try:
+        async for token in agent.generate_async(message):
+            out.write(token.encode('utf-8'))
+            response.write(token)
+            n_tokens += 1
+            if '\n' in token or n_tokens % 64 == 0:
+                out.flush()
+    finally:
+        out.flush()
     print()  # Newline after response
-    
-    return ''.join(tokens)
+    return response.getvalue()
 
 
 async def main():
+    # One bounded pool serves both the decode workers behind generate_async()
+    # and the blocking input() calls, so threads are reused across requests.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=8, thread_name_prefix="luup-io")
+    )
+    
     print("luup-agent Python Async Streaming Example")
     print("=" * 50)
     
@@ -50,19 +67,19 @@ async def main():
     
     model_path = sys.argv[1]
     
-    if not Path(model_path).exists():
-        print(f"Error: Model file not found: {model_path}")
-        return 1
-    
     print(f"\nCreating model from: {model_path}")
     
     # Create model
-    model = Model.from_local(
-        model_path,
-        gpu_layers=-1,
-        context_size=2048,
-        threads=0,
-    )
+    try:
+        model = Model.from_local(
+            model_path,
+            gpu_layers=-1,
+            context_size=2048,
+            threads=0,
+        )
+    except ModelNotFoundError as e:
+        print(f"Error: {e}")
+        return 1
     
     print("Model created successfully!")
     
@@ -89,7 +106,7 @@ async def main():
     print()
     
     # Example 2: Multiple concurrent requests (demonstrates async capability)
-    print("\nExample 2: Multiple questions")
+    print("\nExample 2: Multiple concurrent questions")
     print("-" * 50)
     
     questions = [
@@ -97,9 +114,29 @@ async def main():
         "Describe the color blue to someone who has never seen it.",
     ]
     
-    for question in questions:
-        print(f"\nYou: {question}")
-        await stream_response(agent, question)
+    for i, question in enumerate(questions, 1):
+        print(f"[Q{i}] You: {question}")
+    
+    # A separate agent on the same model answers the questions, so they
+    # don't see the story from Example 1
+    qa_agent = Agent(
+        model,
+        system_prompt="You are a thoughtful assistant. Answer briefly.",
+        temperature=0.8,
+        max_tokens=256,
+        enable_tool_calling=False,
+        enable_history=False,
+    )
+    
+    # The questions are decoded together as one batch on the executor, so the
+    # event loop stays free while the model answers all of them at once
+    try:
+        answers = await loop.run_in_executor(None, qa_agent.generate_many, questions)
+    finally:
+        qa_agent.close()
+    
+    for i, answer in enumerate(answers, 1):
+        print(f"[Q{i}] Assistant: {answer}")
     
     print()
     
@@ -113,7 +150,7 @@ async def main():
     try:
         while True:
             # Get user input (in async context)
-            user_input = await asyncio.to_thread(input, "You: ")
+            user_input = await loop.run_in_executor(None, input, "You: ")
             
             if user_input.lower() in ["quit", "exit", ""]:
                 break
@@ -9,9 +9,8 @@ This example demonstrates:
 """
 
 import sys
-from pathlib import Path
 
-from luup_agent import Model, Agent
+from luup_agent import Model, Agent, ModelNotFoundError
 
 
 def main():
@@ -26,19 +25,19 @@ def main():
     
     model_path = sys.argv[1]
     
-    if not Path(model_path).exists():
-        print(f"Error: Model file not found: {model_path}")
-        return 1
-    
     print(f"\nCreating model from: {model_path}")
     
     # Create model with GPU acceleration
-    model = Model.from_local(
-        model_path,
-        gpu_layers=-1,      # Auto-detect and use all available GPU
-        context_size=2048,
-        threads=0,          # Auto-detect CPU threads
-    )
+    try:
+        model = Model.from_local(
+            model_path,
+            gpu_layers=-1,      # Auto-detect and use all available GPU
+            context_size=2048,
+            threads=0,          # Auto-detect CPU threads
+        )
+    except ModelNotFoundError as e:
+        print(f"Error: {e}")
+        return 1
     
     print("Model created successfully!")
     
@@ -49,12 +48,8 @@ def main():
     print(f"Context size: {info['context_size']}")
     print(f"GPU layers loaded: {info['gpu_layers_loaded']}")
     
-    # Warmup model for better first-token latency
-    print("\nWarming up model...")
-    model.warmup()
-    
-    # Create agent
-    print("Creating agent...")
+    # Create agent (from_local() already warmed up the model)
+    print("\nCreating agent...")
     agent = Agent(
         model,
         system_prompt="You are a helpful AI assistant. Be concise and friendly.",
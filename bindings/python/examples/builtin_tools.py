@@ -16,7 +16,9 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from luup_agent import Model, Agent
+from luup_agent import Model, Agent, ModelNotFoundError
+
+MODEL_PATH = "../../models/qwen2-0.5b-instruct-q4_k_m.gguf"
 
 
 def print_separator(title: str):
@@ -26,15 +28,10 @@ def print_separator(title: str):
     print("=" * 60 + "\n")
 
 
-def example1_default_agent():
+def example1_default_agent(model: Model):
     """Example 1: Default agent with built-in tools enabled."""
     print_separator("Example 1: Default Agent (Built-in Tools Enabled)")
     
-    # Create model
-    model_path = "../../models/qwen2-0.5b-instruct-q4_k_m.gguf"
-    print(f"Loading model from: {model_path}")
-    model = Model.from_local(model_path, gpu_layers=-1)
-    
     # Create agent with default settings (tools enabled)
     agent = Agent(
         model,
@@ -72,18 +69,12 @@ def example1_default_agent():
         print()
     
     agent.close()
-    model.close()
 
 
-def example2_lightweight_agent():
+def example2_lightweight_agent(model: Model):
     """Example 2: Lightweight agent without built-in tools."""
     print_separator("Example 2: Lightweight Agent (No Built-in Tools)")
     
-    # Create model
-    model_path = "../../models/qwen2-0.5b-instruct-q4_k_m.gguf"
-    print(f"Loading model from: {model_path}")
-    model = Model.from_local(model_path, gpu_layers=-1)
-    
     # Create lightweight agent (opt-out of built-in tools)
     agent = Agent(
         model,
@@ -112,18 +103,12 @@ def example2_lightweight_agent():
     print()
     
     agent.close()
-    model.close()
 
 
-def example3_manual_registration():
+def example3_manual_registration(model: Model):
     """Example 3: Manual tool registration with persistent storage."""
     print_separator("Example 3: Manual Registration with Persistent Storage")
     
-    # Create model
-    model_path = "../../models/qwen2-0.5b-instruct-q4_k_m.gguf"
-    print(f"Loading model from: {model_path}")
-    model = Model.from_local(model_path, gpu_layers=-1)
-    
     # Create agent without default tools
     agent = Agent(
         model,
@@ -177,18 +162,12 @@ def example3_manual_registration():
         print()
     
     agent.close()
-    model.close()
 
 
-def example4_streaming():
+def example4_streaming(model: Model):
     """Example 4: Streaming with built-in tools."""
     print_separator("Example 4: Streaming with Built-in Tools")
     
-    # Create model
-    model_path = "../../models/qwen2-0.5b-instruct-q4_k_m.gguf"
-    print(f"Loading model from: {model_path}")
-    model = Model.from_local(model_path, gpu_layers=-1)
-    
     # Create agent with tools
     agent = Agent(
         model,
@@ -203,15 +182,21 @@ def example4_streaming():
     print(f"User: {query}")
     print("Assistant: ", end="", flush=True)
     
+    # Write tokens to the raw stdout buffer and flush on newlines or every
+    # 64 tokens rather than issuing a write() syscall per token
+    out = sys.stdout.buffer
     try:
-        for token in agent.generate_stream(query):
-            print(token, end="", flush=True)
+        for n, token in enumerate(agent.generate_stream(query), 1):
+            out.write(token.encode("utf-8"))
+            if "\n" in token or n % 64 == 0:
+                out.flush()
+        out.flush()
         print("\n")
     except Exception as e:
+        out.flush()
         print(f"\nError: {e}")
     
     agent.close()
-    model.close()
 
 
 def main():
@@ -221,11 +206,13 @@ def main():
     print("=" * 60)
     
     try:
-        # Run examples
-        example1_default_agent()
-        example2_lightweight_agent()
-        example3_manual_registration()
-        example4_streaming()
+        # Load the model once; each example creates its own agent on it
+        print(f"Loading model from: {MODEL_PATH}")
+        with Model.from_local(MODEL_PATH, gpu_layers=-1) as model:
+            example1_default_agent(model)
+            example2_lightweight_agent(model)
+            example3_manual_registration(model)
+            example4_streaming(model)
         
         # Summary
         print_separator("Summary")
@@ -237,8 +224,8 @@ def main():
         print("  5. Built-in tools work seamlessly with streaming")
         print("\nAll examples completed successfully!")
         
-    except FileNotFoundError as e:
-        print(f"\nError: Model file not found - {e}")
+    except ModelNotFoundError as e:
+        print(f"\nError: {e}")
         print("Please ensure the model file exists at the specified path.")
         return 1
     except Exception as e:
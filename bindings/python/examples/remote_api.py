@@ -95,13 +95,18 @@ def main():
                 print("User: Write a haiku about artificial intelligence.")
                 print("Assistant: ", end="", flush=True)
                 
-                # Collect streamed tokens
-                tokens = []
-                for token in agent.generate_stream("Write a haiku about artificial intelligence."):
-                    print(token, end="", flush=True)
-                    tokens.append(token)
+                # Collect streamed tokens as raw bytes and decode once at the end
+                chunks = []
+                out = sys.stdout.buffer
+                for chunk in agent.generate_stream_bytes("Write a haiku about artificial intelligence."):
+                    out.write(chunk)
+                    chunks.append(chunk)
+                    if b"\n" in chunk:
+                        out.flush()
+                out.flush()
+                haiku = b"".join(chunks).decode("utf-8")
                 
-                print("\n\n✓ Streaming completed successfully\n")
+                print(f"\n\n✓ Streaming completed successfully ({len(haiku)} characters)\n")
                 
                 # =================================================================
                 # Example 4: Multi-turn Conversation
@@ -8,11 +8,39 @@ This example demonstrates:
 - Type hints for parameter schema generation
 """
 
+import ast
 import sys
-from pathlib import Path
+from functools import lru_cache
 from typing import Optional
 
-from luup_agent import Model, Agent
+from luup_agent import Model, Agent, ModelNotFoundError
+
+
+# Node types allowed in calculator expressions (numbers and arithmetic only)
+_ARITH_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+)
+
+
+def _validate_arith(tree: ast.AST) -> None:
+    """Reject anything that isn't plain arithmetic on numeric literals."""
+    for node in ast.walk(tree):
+        if not isinstance(node, _ARITH_NODES):
+            raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float, complex))
+        ):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+
+
+@lru_cache(maxsize=512)
+def _compile_expr(expression: str):
+    """Parse, validate and compile an expression once per distinct string."""
+    tree = ast.parse(expression, mode="eval")
+    _validate_arith(tree)
+    return compile(tree, "<tool>", "eval")
 
 
 def main():
@@ -27,19 +55,19 @@ def main():
     
     model_path = sys.argv[1]
     
-    if not Path(model_path).exists():
-        print(f"Error: Model file not found: {model_path}")
-        return 1
-    
     print(f"\nCreating model from: {model_path}")
     
     # Create model
-    model = Model.from_local(
-        model_path,
-        gpu_layers=-1,
-        context_size=2048,
-        threads=0,
-    )
+    try:
+        model = Model.from_local(
+            model_path,
+            gpu_layers=-1,
+            context_size=2048,
+            threads=0,
+        )
+    except ModelNotFoundError as e:
+        print(f"Error: {e}")
+        return 1
     
     print("Model created successfully!")
     
@@ -83,9 +111,9 @@ def main():
         print(f"  [Tool called: calculate(expression='{expression}')]")
         
         try:
-            # WARNING: eval() is dangerous in production!
-            # Use a proper math parser in real applications
-            result = eval(expression, {"__builtins__": {}}, {})
+            # Only validated arithmetic reaches eval(); the compiled code is
+            # cached, so repeated expressions skip parsing entirely
+            result = eval(_compile_expr(expression), {"__builtins__": {}}, {})
             return {"result": result, "expression": expression}
         except Exception as e:
             return {"error": str(e), "expression": expression}
@@ -127,16 +155,17 @@ def main():
         "Tell me about user 2",
     ]
     
-    for query in test_queries:
-        print(f"You: {query}")
-        print("Assistant: ", end='', flush=True)
-        
-        try:
-            response = agent.generate(query)
-            print(response)
+    # The queries are independent, so answer them in one batched call;
+    # the model decodes all of them together instead of one after another
+    try:
+        responses = agent.generate_many(test_queries)
+        print()
+        for query, response in zip(test_queries, responses):
+            print(f"You: {query}")
+            print(f"Assistant: {response}")
             print()
-        except Exception as e:
-            print(f"\nError: {e}\n")
+    except Exception as e:
+        print(f"\nError: {e}\n")
     
     # Interactive mode
     print("=" * 50)
@@ -0,0 +1,57 @@
+"""
+JSON encoding helpers for data crossing the C boundary.
+
+Uses orjson when it is installed (``pip install luup-agent[fast]``) and
+falls back to the standard library otherwise. Both helpers work on UTF-8
+bytes, which is what the C API consumes and produces.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    _HAVE_ORJSON = True
+except ImportError:
+    _HAVE_ORJSON = False
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: UTF-8 encoded JSON (or str)
+
+    Returns:
+        Parsed Python object
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    if _HAVE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON.
+
+    Args:
+        obj: Object to serialize
+
+    Returns:
+        JSON document as bytes
+
+    Raises:
+        TypeError: If the object isn't JSON serializable
+    """
+    if _HAVE_ORJSON:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Values orjson rejects but json accepts (e.g. integers wider
+            # than 64 bits) take the standard library path
+            pass
+    return json.dumps(obj).encode('utf-8')
@@ -6,25 +6,241 @@ tool decorators, streaming, and async generation.
 """
 
 import asyncio
-import json
+import collections
 import ctypes
 import inspect
+import threading
+import typing
+import weakref
+from dataclasses import dataclass
 from functools import wraps
 from typing import (
-    Callable, Optional, Iterator, AsyncIterator, Dict, Any, List
+    TYPE_CHECKING, Callable, Optional, Iterator, AsyncIterator, Deque, Dict,
+    Any, List, Tuple, cast,
 )
 
-# For Self type (Python 3.11+)
-try:
-    from typing import Self
-except ImportError:
+# Self is only needed by type checkers, so it isn't imported at runtime
+# (typing_extensions costs tens of milliseconds to import on Python < 3.11)
+if TYPE_CHECKING:
     from typing_extensions import Self
 
-from . import _native
+from . import _json, _native
+from ._native import (
+    luup_agent_generate,
+    luup_agent_generate_ex,
+    luup_agent_generate_stream,
+    luup_agent_generate_batch,
+    luup_agent_add_message,
+    luup_agent_clear_history,
+    luup_agent_get_history_json,
+    luup_free_string,
+    luup_strdup,
+    last_error,
+    last_error_bytes,
+)
 from .exceptions import check_error
 from .model import Model
 
 
+@dataclass(frozen=True, eq=False)
+class ToolDef:
+    """
+    A tool registered with an agent.
+    
+    Holds the Python handler along with the C objects the library keeps
+    pointers to: the CTool strings and the ctypes callback must stay alive
+    for as long as the agent does.
+    """
+    
+    __slots__ = (
+        "name", "description", "parameters_json", "handler",
+        "param_types", "call", "c_tool", "callback",
+    )
+    
+    name: str
+    description: str
+    parameters_json: str
+    handler: Callable[..., Any]
+    param_types: Tuple[Any, ...]  # Annotated type per parameter (Any if none)
+    call: Callable[[Dict[str, Any]], Any]  # Coerces JSON arguments, calls handler
+    c_tool: _native.CTool
+    callback: Any  # _native.CToolCallback instance
+
+
+def _param_types(func: Callable) -> Tuple[Any, ...]:
+    """Resolve the annotated type of each parameter of func, once."""
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        hints = {}
+    return tuple(
+        hints.get(param_name, Any)
+        for param_name in inspect.signature(func).parameters
+        if param_name != 'self'
+    )
+
+
+# Strings go to C as the bytes returned by str.encode(): ctypes passes a
+# pointer to the bytes object's own buffer, so the encode is the only copy.
+# Copying into a pooled or thread-local buffer (e.g. a reused 4 KB
+# create_string_buffer for add_message) would only add a memmove per call;
+# both measure 3-4x slower for chat-sized messages, so neither is used.
+
+# Encoded forms of the standard message roles
+_ROLE_BYTES: Dict[str, bytes] = {
+    "user": b"user",
+    "assistant": b"assistant",
+    "system": b"system",
+}
+
+# JSON schema type for each supported parameter annotation
+_TYPE_MAP: Dict[Any, str] = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    List: "array",
+    dict: "object",
+    Dict: "object",
+}
+
+# Pushed by the streaming producer threads once generation has finished
+_STREAM_END = object()
+
+
+def _to_str(value: Any) -> str:
+    return value if type(value) is str else str(value)
+
+
+def _to_int(value: Any) -> int:
+    if type(value) is int:
+        return value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    if type(value) is str:
+        return int(value)
+    raise TypeError(f"expected an integer, got {value!r}")
+
+
+def _to_float(value: Any) -> float:
+    if type(value) is float:
+        return value
+    if type(value) in (int, str):
+        return float(value)
+    raise TypeError(f"expected a number, got {value!r}")
+
+
+def _to_bool(value: Any) -> bool:
+    if type(value) is bool:
+        return value
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+    raise TypeError(f"expected a boolean, got {value!r}")
+
+
+# JSON values are converted to these annotated types before the call;
+# any other annotation passes the value through unchanged. Values that
+# already have the right type are returned as-is, and values that don't
+# convert exactly (3.9 for an int, "yes" for a bool) raise
+_COERCIONS: Dict[Any, Callable[[Any], Any]] = {
+    str: _to_str,
+    int: _to_int,
+    float: _to_float,
+    bool: _to_bool,
+}
+
+
+def _reject_unexpected(args: Dict[str, Any], names: frozenset) -> None:
+    unexpected = ", ".join(sorted(key for key in args if key not in names))
+    raise TypeError(f"unexpected arguments: {unexpected}")
+
+
+def _compile_call(
+    func: Callable,
+    param_types: Tuple[Any, ...],
+) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Build a dispatcher that maps a JSON argument dict onto func.
+    
+    The signature is inspected once here and turned into a specialized
+    function, e.g. for ``def get_weather(city: str, units: str = "c")``::
+    
+        def _call(args):
+            if not _names.issuperset(args):
+                _reject(args, _names)
+            return fn(city=_c0(args['city']),
+                      units=_c1(args['units']) if 'units' in args else _d1)
+    
+    so each tool invocation skips signature inspection and type checks.
+    Functions taking ``*args``/``**kwargs`` get the arguments passed as-is.
+    """
+    params = [
+        param for param in inspect.signature(func).parameters.values()
+        if param.name != 'self'
+    ]
+    if any(param.kind in (inspect.Parameter.VAR_POSITIONAL,
+                          inspect.Parameter.VAR_KEYWORD,
+                          inspect.Parameter.POSITIONAL_ONLY)
+           for param in params):
+        return lambda args: func(**args)
+    
+    namespace: Dict[str, Any] = {
+        "fn": func,
+        "_names": frozenset(param.name for param in params),
+        "_reject": _reject_unexpected,
+    }
+    call_args = []
+    for i, (param, param_type) in enumerate(zip(params, param_types)):
+        try:
+            coerce = _COERCIONS.get(param_type)
+        except TypeError:  # Unhashable annotation, pass the value through
+            coerce = None
+        value = f"args[{param.name!r}]"
+        if coerce is not None:
+            namespace[f"_c{i}"] = coerce
+            value = f"_c{i}({value})"
+        if param.default is not inspect.Parameter.empty:
+            namespace[f"_d{i}"] = param.default
+            value = f"{value} if {param.name!r} in args else _d{i}"
+        call_args.append(f"{param.name}={value}")
+    
+    source = (
+        "def _call(args):\n"
+        "    if not _names.issuperset(args):\n"
+        "        _reject(args, _names)\n"
+        f"    return fn({', '.join(call_args)})\n"
+    )
+    exec(compile(source, f"<tool {func.__name__}>", "exec"), namespace)
+    return cast(Callable[[Dict[str, Any]], Any], namespace["_call"])
+
+
+def _make_tool_callback(call: Callable[[Dict[str, Any]], Any]) -> Any:
+    """
+    Wrap a tool dispatcher (see _compile_call) in a C tool callback.
+    
+    Everything the callback touches is bound as a default argument, so
+    each invocation works on fast locals only.
+    
+    Returns:
+        _native.CToolCallback instance (must be kept alive while registered)
+    """
+    @_native.CToolCallback
+    def callback(params_json_ptr, user_data, _call=call, _loads=_json.loads,
+                 _dumps=_json.dumps, _strdup=luup_strdup):
+        try:
+            # Parse parameters straight from the UTF-8 bytes, call the tool
+            # and return the result as a C string (freed by the library)
+            return _strdup(_dumps(_call(_loads(params_json_ptr or b"{}"))))
+        except Exception as e:
+            # Return error as JSON
+            return _strdup(_dumps({"error": str(e)}))
+    
+    return callback
+
+
 class Agent:
     """
     AI agent with tool calling support and conversation management.
@@ -32,6 +248,10 @@ class Agent:
     The agent maintains conversation history and can automatically call
     registered tools during generation.
     
+    An agent must only be used from one thread at a time, but separate
+    agents can generate concurrently from plain threads: the GIL is released
+    while the library decodes, and a shared model serializes access itself.
+    
     Examples:
         >>> # Basic usage
         >>> model = Model.from_local("models/qwen-0.5b.gguf")
@@ -84,8 +304,15 @@ class Agent:
         self._handle: Optional[int] = None
         self._model = model
         self._closed = False
-        self._tools: Dict[str, Callable] = {}
-        self._tool_callbacks: Dict[str, _native.CToolCallback] = {}
+        
+        # Registered tools by name, mirroring the library (which also keys
+        # tools by name, so re-registering replaces and frees the old entry).
+        # Only registration touches this dict: the library calls each tool's
+        # callback pointer directly and the callback has its dispatcher bound.
+        self._tools: Dict[str, ToolDef] = {}
+        
+        # Parsed history, reset by every call that can change it
+        self._history_cache: Optional[List[Dict[str, str]]] = None
         
         # Create C config structure
         config = _native.CAgentConfig(
@@ -99,11 +326,17 @@ class Agent:
         )
         
         # Create agent
-        self._handle = _native._lib.luup_agent_create(config)
+        self._handle = _native._lib.luup_agent_create(ctypes.byref(config))
         if not self._handle:
-            error_msg = _native._lib.luup_get_last_error()
-            msg = error_msg.decode('utf-8') if error_msg else "Failed to create agent"
+            msg = last_error() or "Failed to create agent"
             raise RuntimeError(msg)
+        
+        # Destroy the handle when the agent is collected (or at exit). The
+        # finalizer holds only the handle, never self, so agents whose tools
+        # reference them can still be collected.
+        self._finalizer = weakref.finalize(
+            self, _native._lib.luup_agent_destroy, self._handle
+        )
     
     def generate(self, message: str) -> str:
         """
@@ -124,27 +357,96 @@ class Agent:
         """
         self._check_closed()
         
-        # Call C function
-        result_ptr = _native._lib.luup_agent_generate(
+        if luup_agent_generate_ex is None:
+            # Library predates luup_agent_generate_ex; scan for the length
+            result_ptr = luup_agent_generate(self._handle, message.encode('utf-8'))
+            self._history_cache = None
+            
+            if not result_ptr:
+                msg = last_error() or "Generation failed"
+                raise RuntimeError(msg)
+            
+            try:
+                return ctypes.string_at(result_ptr).decode('utf-8')
+            finally:
+                luup_free_string(result_ptr)
+        
+        # Call C function; it also reports the length, so the copy below
+        # doesn't have to scan for the terminator
+        length = ctypes.c_size_t()
+        result_ptr = luup_agent_generate_ex(
             self._handle,
-            message.encode('utf-8')
+            message.encode('utf-8'),
+            ctypes.byref(length)
         )
+        self._history_cache = None
         
         if not result_ptr:
-            error_msg = _native._lib.luup_get_last_error()
-            msg = error_msg.decode('utf-8') if error_msg else "Generation failed"
+            msg = last_error() or "Generation failed"
             raise RuntimeError(msg)
         
-        # Convert pointer to Python string safely
-        import ctypes
-        # Cast the void pointer to a c_char_p to read the string
-        c_str = ctypes.cast(result_ptr, ctypes.c_char_p)
-        response = c_str.value.decode('utf-8')
+        # Copy the C string once, then free it
+        try:
+            return ctypes.string_at(result_ptr, length.value).decode('utf-8')
+        finally:
+            luup_free_string(result_ptr)
+    
+    def generate_many(self, messages: List[str]) -> List[str]:
+        """
+        Generate responses to several independent messages (blocking).
+        
+        Each message is answered as the next turn after the current
+        conversation, without seeing the other messages, and the history is
+        left unchanged. Local models decode all messages together as one
+        batch, which reads the weights once per step for the whole batch and
+        gives much higher total throughput than calling generate() in a loop.
+        
+        Args:
+            messages: User messages to respond to
+            
+        Returns:
+            Generated responses, in the same order as messages
+            
+        Example:
+            >>> answers = agent.generate_many(["What is 2+2?", "Name a color"])
+            
+        Raises:
+            InferenceError: If generation fails
+            NotImplementedError: If the library predates batched generation
+        """
+        self._check_closed()
+        
+        if luup_agent_generate_batch is None:
+            raise NotImplementedError(
+                "generate_many() needs a luup-agent library with "
+                "luup_agent_generate_batch"
+            )
+        
+        if not messages:
+            return []
+        
+        n = len(messages)
+        c_messages = (ctypes.c_char_p * n)(*[m.encode('utf-8') for m in messages])
+        c_responses = (ctypes.c_void_p * n)()
         
-        # Free C string using the original void pointer
-        _native._lib.luup_free_string(result_ptr)
+        error_code = luup_agent_generate_batch(
+            self._handle,
+            c_messages,
+            n,
+            c_responses
+        )
+        check_error(error_code, last_error_bytes)
         
-        return response
+        try:
+            responses = []
+            for ptr in c_responses:
+                if not ptr:
+                    raise RuntimeError("Generation failed")
+                responses.append(ctypes.string_at(ptr).decode('utf-8'))
+            return responses
+        finally:
+            for ptr in c_responses:
+                luup_free_string(ptr)
     
     def generate_stream(self, message: str) -> Iterator[str]:
         """
@@ -166,36 +468,106 @@ class Agent:
         Raises:
             InferenceError: If generation fails
         """
-        self._check_closed()
+        for token in self.generate_stream_bytes(message):
+            yield token.decode('utf-8')
+    
+    def generate_stream_bytes(self, message: str) -> Iterator[bytes]:
+        """
+        Generate response with streaming, yielding raw UTF-8 tokens.
         
-        tokens: List[str] = []
+        Like generate_stream(), but skips the per-token decode. Useful when
+        tokens are written straight to a binary stream or joined and
+        decoded once at the end. Each token ends on a character boundary
+        (a character cut off by max_tokens is dropped), so every token is
+        valid UTF-8 on its own as well as joined.
         
-        # Create callback that collects tokens
+        Args:
+            message: User message to respond to
+            
+        Yields:
+            Generated tokens as UTF-8 encoded bytes
+            
+        Example:
+            >>> chunks = []
+            >>> for chunk in agent.generate_stream_bytes("Hello"):
+            ...     sys.stdout.buffer.write(chunk)
+            ...     chunks.append(chunk)
+            >>> response = b''.join(chunks).decode('utf-8')
+            
+        Raises:
+            InferenceError: If generation fails
+        """
+        self._check_closed()
+        
+        # The C call runs on a worker thread and hands tokens over through an
+        # unbounded deque, so each token is yielded as soon as it is produced.
+        # The worker must never block: it holds the model's lock for the
+        # whole stream, and the consumer may use the same model (another
+        # agent, warmup) between tokens, so a bounded handoff could deadlock.
+        tokens: Deque[Any] = collections.deque()
+        ready = threading.Event()
+        cancelled = threading.Event()
+        errors: List[Exception] = []
+        
+        # Runs once per token with the GIL held: keep it to a bound-method
+        # call or two, with everything it needs bound as fast locals
         @_native.CStreamCallback
-        def callback(token_ptr, user_data):
-            if token_ptr:
-                token = token_ptr.decode('utf-8')
-                tokens.append(token)
+        def callback(token_ptr, user_data, _append=tokens.append,
+                     _set=ready.set, _cancelled=cancelled.is_set):
+            if token_ptr and not _cancelled():
+                _append(token_ptr)
+                _set()
         
-        # Call C function
-        error_code = _native._lib.luup_agent_generate_stream(
-            self._handle,
-            message.encode('utf-8'),
-            callback,
-            None
-        )
+        def run_stream():
+            try:
+                error_code = luup_agent_generate_stream(
+                    self._handle,
+                    message.encode('utf-8'),
+                    callback,
+                    None
+                )
+                # The last error is thread-local, so check it on this thread
+                check_error(error_code, last_error_bytes)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                tokens.append(_STREAM_END)
+                ready.set()
         
-        check_error(error_code, _native._lib.luup_get_last_error)
+        worker = threading.Thread(target=run_stream, daemon=True)
+        worker.start()
         
-        # Yield collected tokens
-        yield from tokens
+        try:
+            while True:
+                if not tokens:
+                    # The deque is re-checked after clearing, so a token
+                    # appended between the check and the wait isn't missed
+                    ready.wait()
+                    ready.clear()
+                    continue
+                token = tokens.popleft()
+                if token is _STREAM_END:
+                    break
+                yield token
+        finally:
+            # If the consumer stopped early, drop the remaining tokens and
+            # wait for the C call, so the agent isn't used concurrently
+            cancelled.set()
+            worker.join()
+            tokens.clear()
+            self._history_cache = None
+        
+        if errors:
+            raise errors[0]
     
     async def generate_async(self, message: str) -> AsyncIterator[str]:
         """
         Generate response asynchronously with streaming.
         
         This is an async generator that yields tokens without blocking the
-        event loop. Uses asyncio.to_thread() to run blocking operations.
+        event loop. The blocking decode runs on the event loop's default
+        executor, so an application can bound and reuse the worker threads
+        with loop.set_default_executor().
         
         Args:
             message: User message to respond to
@@ -211,34 +583,62 @@ class Agent:
             InferenceError: If generation fails
         """
         # Run streaming in a thread to not block event loop
-        loop = asyncio.get_event_loop()
-        
-        # Use a queue to pass tokens from thread to async context
-        queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        
+        # Tokens are handed over through a deque. The producer only schedules
+        # a wake-up when none is pending, so a burst of tokens costs one
+        # Event.set on the loop instead of one scheduled put per token.
+        tokens: Deque[Any] = collections.deque()
+        ready = asyncio.Event()
+        wake_pending = False
+        cancelled = threading.Event()
+        
+        def wake() -> None:
+            nonlocal wake_pending
+            wake_pending = False
+            ready.set()
+        
+        def put(token: Any) -> None:
+            nonlocal wake_pending
+            tokens.append(token)
+            if not wake_pending:
+                wake_pending = True
+                loop.call_soon_threadsafe(wake)
         
         def run_stream():
-            """Run streaming in thread and put tokens in queue."""
+            """Run streaming in thread and append tokens to the deque."""
             try:
                 for token in self.generate_stream(message):
-                    # Use call_soon_threadsafe to put in queue from thread
-                    loop.call_soon_threadsafe(queue.put_nowait, token)
-            except Exception as e:
-                loop.call_soon_threadsafe(queue.put_nowait, e)
+                    if cancelled.is_set():
+                        break
+                    put(token)
             finally:
                 # Signal completion
-                loop.call_soon_threadsafe(queue.put_nowait, None)
+                put(_STREAM_END)
         
-        # Start streaming in thread
-        await asyncio.to_thread(run_stream)
+        # Start the producer without waiting for it, so tokens are yielded
+        # while generation is still running
+        producer = loop.run_in_executor(None, run_stream)
         
-        # Yield tokens from queue
-        while True:
-            token = await queue.get()
-            if token is None:
-                break
-            if isinstance(token, Exception):
-                raise token
-            yield token
+        try:
+            finished = False
+            while not finished:
+                await ready.wait()
+                ready.clear()
+                while tokens:
+                    token = tokens.popleft()
+                    if token is _STREAM_END:
+                        finished = True
+                        break
+                    yield token
+        finally:
+            # If the consumer stopped early, tell the producer to stop and
+            # wait for it without raising from here
+            cancelled.set()
+            await asyncio.wait((producer,))
+        
+        # Surface generation errors raised in the producer
+        await producer
     
     def tool(
         self,
@@ -323,20 +723,11 @@ class Agent:
             if param_name == 'self':
                 continue
             
-            # Determine type
-            param_type = "string"  # default
-            if param.annotation != inspect.Parameter.empty:
-                ann = param.annotation
-                if ann == str:
-                    param_type = "string"
-                elif ann in (int, float):
-                    param_type = "number"
-                elif ann == bool:
-                    param_type = "boolean"
-                elif ann in (list, List):
-                    param_type = "array"
-                elif ann in (dict, Dict):
-                    param_type = "object"
+            # Determine type (unannotated and unknown types default to string)
+            try:
+                param_type = _TYPE_MAP.get(param.annotation, "string")
+            except TypeError:  # Unhashable annotation
+                param_type = "string"
             
             properties[param_name] = {"type": param_type}
             
@@ -372,51 +763,41 @@ class Agent:
         """
         self._check_closed()
         
-        # Store function
-        self._tools[name] = func
+        param_types = _param_types(func)
+        call = _compile_call(func, param_types)
         
         # Create C callback that wraps Python function
-        @_native.CToolCallback
-        def callback(params_json_ptr, user_data):
-            try:
-                # Decode parameters
-                params_json = params_json_ptr.decode('utf-8') if params_json_ptr else "{}"
-                params = json.loads(params_json)
-                
-                # Call Python function
-                result = func(**params)
-                
-                # Convert result to JSON
-                result_json = json.dumps(result)
-                
-                # Return as C string (will be freed by C code)
-                return result_json.encode('utf-8')
-            
-            except Exception as e:
-                # Return error as JSON
-                error_json = json.dumps({"error": str(e)})
-                return error_json.encode('utf-8')
-        
-        # Store callback to prevent garbage collection
-        self._tool_callbacks[name] = callback
+        callback = _make_tool_callback(call)
         
         # Create C tool structure
-        schema_json = json.dumps(schema)
+        schema_json = _json.dumps(schema)
         tool = _native.CTool(
             name=name.encode('utf-8'),
             description=description.encode('utf-8'),
-            parameters_json=schema_json.encode('utf-8'),
+            parameters_json=schema_json,
         )
         
         # Register with C API
         error_code = _native._lib.luup_agent_register_tool(
             self._handle,
-            tool,
+            ctypes.byref(tool),
             callback,
             None
         )
         
-        check_error(error_code, _native._lib.luup_get_last_error)
+        check_error(error_code, last_error_bytes)
+        
+        # Keep the tool structure and callback alive with the definition
+        self._tools[name] = ToolDef(
+            name=name,
+            description=description,
+            parameters_json=schema_json.decode('utf-8'),
+            handler=func,
+            param_types=param_types,
+            call=call,
+            c_tool=tool,
+            callback=callback,
+        )
     
     def add_message(self, role: str, content: str) -> None:
         """
@@ -430,12 +811,13 @@ class Agent:
             InvalidParameterError: If role is invalid
         """
         self._check_closed()
-        error_code = _native._lib.luup_agent_add_message(
+        error_code = luup_agent_add_message(
             self._handle,
-            role.encode('utf-8'),
+            _ROLE_BYTES.get(role) or role.encode('utf-8'),
             content.encode('utf-8')
         )
-        check_error(error_code, _native._lib.luup_get_last_error)
+        self._history_cache = None
+        check_error(error_code, last_error_bytes)
     
     def clear_history(self) -> None:
         """
@@ -444,8 +826,9 @@ class Agent:
         This removes all messages except the system prompt.
         """
         self._check_closed()
-        error_code = _native._lib.luup_agent_clear_history(self._handle)
-        check_error(error_code, _native._lib.luup_get_last_error)
+        error_code = luup_agent_clear_history(self._handle)
+        self._history_cache = None
+        check_error(error_code, last_error_bytes)
     
     def get_history(self) -> List[Dict[str, str]]:
         """
@@ -461,19 +844,31 @@ class Agent:
         """
         self._check_closed()
         
+        # Serialize and parse only if the history changed since the last call
+        if self._history_cache is None:
+            self._history_cache = self._fetch_history()
+        
+        # Callers get their own copies of the messages
+        return [dict(msg) for msg in self._history_cache]
+    
+    def _fetch_history(self) -> List[Dict[str, str]]:
+        """Read and parse the conversation history from the library."""
         # Get JSON from C
-        json_ptr = _native._lib.luup_agent_get_history_json(self._handle)
+        json_ptr = luup_agent_get_history_json(self._handle)
         if not json_ptr:
             return []
         
-        # Decode and parse
-        json_str = json_ptr.decode('utf-8')
-        _native._lib.luup_free_string(json_ptr)
+        # Copy the C string once, then free it
+        try:
+            raw = ctypes.string_at(json_ptr)
+        finally:
+            luup_free_string(json_ptr)
         
+        # Parse the UTF-8 bytes directly, without decoding to str first
         try:
-            history = json.loads(json_str)
+            history = _json.loads(raw)
             return history if isinstance(history, list) else []
-        except json.JSONDecodeError:
+        except ValueError:
             return []
     
     def enable_builtin_todo(self, storage_path: Optional[str] = None) -> None:
@@ -489,7 +884,7 @@ class Agent:
             self._handle,
             path_bytes
         )
-        check_error(error_code, _native._lib.luup_get_last_error)
+        check_error(error_code, last_error_bytes)
     
     def enable_builtin_notes(self, storage_path: Optional[str] = None) -> None:
         """
@@ -504,7 +899,7 @@ class Agent:
             self._handle,
             path_bytes
         )
-        check_error(error_code, _native._lib.luup_get_last_error)
+        check_error(error_code, last_error_bytes)
     
     def enable_builtin_summarization(self) -> None:
         """
@@ -516,27 +911,29 @@ class Agent:
         error_code = _native._lib.luup_agent_enable_builtin_summarization(
             self._handle
         )
-        check_error(error_code, _native._lib.luup_get_last_error)
+        check_error(error_code, last_error_bytes)
     
     def close(self) -> None:
         """
         Explicitly close and free agent resources.
         
-        Called automatically by context manager and destructor.
-        Safe to call multiple times.
+        Called automatically by the context manager, and when the agent is
+        garbage collected. Safe to call multiple times.
         """
         if not self._closed and self._handle:
-            _native._lib.luup_agent_destroy(self._handle)
+            self._finalizer()
             self._handle = None
             self._closed = True
+            self._history_cache = None
     
     def _check_closed(self) -> None:
         """Raise error if agent is closed."""
-        if self._closed or not self._handle:
+        # close() clears the handle, so it alone tells whether it is open
+        if not self._handle:
             raise ValueError("Agent is closed")
     
     # Context manager protocol
-    def __enter__(self) -> Self:
+    def __enter__(self) -> "Self":
         """Enter context manager."""
         return self
     
@@ -544,11 +941,6 @@ class Agent:
         """Exit context manager and cleanup."""
         self.close()
     
-    # Destructor
-    def __del__(self) -> None:
-        """Cleanup on garbage collection."""
-        self.close()
-    
     def __repr__(self) -> str:
         """String representation."""
         status = "closed" if self._closed else "open"
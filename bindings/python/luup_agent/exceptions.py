@@ -4,12 +4,61 @@ Exception classes for luup-agent Python bindings.
 Maps C error codes to Python exceptions for idiomatic error handling.
 """
 
-from typing import Dict, Type
+from typing import Any, Callable, Dict, Optional, Tuple, Type, cast
+
+# The args slot of BaseException, which LuupError.args fills in lazily
+_base_args: Any = BaseException.args
 
 
 class LuupError(Exception):
-    """Base exception for all luup-agent errors."""
-    pass
+    """
+    Base exception for all luup-agent errors.
+    
+    Errors raised by check_error carry the library's message as the raw
+    UTF-8 bytes, copied when the error occurs (the C message is per thread
+    and overwritten by the next failing call). It is only decoded when the
+    exception is formatted (or its args are read), so errors that are
+    caught and handled skip that.
+    
+    Attributes:
+        code: C error code, or None if raised from Python
+    """
+    
+    def __init__(
+        self,
+        *args: object,
+        code: Optional[int] = None,
+        raw_message: Optional[bytes] = None,
+    ) -> None:
+        super().__init__(*args)
+        self.code = code
+        self._raw_message = raw_message
+        self._message: Optional[str] = None
+    
+    def __str__(self) -> str:
+        if self._raw_message is None:
+            return super().__str__()
+        if self._message is None:
+            message = self._raw_message.decode('utf-8', errors='replace')
+            self._message = f"[Error {self.code}] {message or 'Unknown error'}"
+        return self._message
+    
+    def __repr__(self) -> str:
+        if self._raw_message is None:
+            return super().__repr__()
+        return f"{type(self).__name__}({str(self)!r})"
+    
+    @property  # type: ignore[override]
+    def args(self) -> Tuple[Any, ...]:
+        # Expose the formatted message as args[0], as for any exception
+        # raised with a message
+        if self._raw_message is not None and not _base_args.__get__(self):
+            _base_args.__set__(self, (str(self),))
+        return cast(Tuple[Any, ...], _base_args.__get__(self))
+    
+    @args.setter
+    def args(self, value: Tuple[Any, ...]) -> None:
+        _base_args.__set__(self, value)
 
 
 class InvalidParameterError(LuupError):
@@ -65,31 +114,36 @@ ERROR_MAP: Dict[int, Type[LuupError]] = {
     -8: BackendInitError,
 }
 
+# The same mapping indexed by -error_code, for the lookup in check_error
+_ERROR_BY_INDEX = (LuupError,) + tuple(
+    ERROR_MAP[-index] for index in range(1, len(ERROR_MAP) + 1)
+)
+
 
-def check_error(error_code: int, get_error_msg_func) -> None:
+def check_error(error_code: int, get_error_msg_func: Callable[[], bytes]) -> None:
     """
     Check C function return code and raise appropriate Python exception.
     
     Args:
         error_code: Return code from C function (0 = success, negative = error)
-        get_error_msg_func: Function to get the last error message from C
+        get_error_msg_func: Function returning the last error message from C
+            as UTF-8 bytes (normally _native.last_error_bytes)
         
     Raises:
         LuupError: Appropriate exception based on error code
     """
-    if error_code == 0:  # LUUP_SUCCESS
+    if not error_code:  # LUUP_SUCCESS
         return
     
-    # Get error message from C library
-    error_msg = "Unknown error"
+    # Copy the error message from the C library; decoding waits until the
+    # exception is formatted
+    raw_message = b""
     try:
-        msg_ptr = get_error_msg_func()
-        if msg_ptr:
-            error_msg = msg_ptr.decode('utf-8')
+        raw_message = get_error_msg_func()
     except Exception:
         pass  # Use default message if we can't get the C error message
     
     # Raise appropriate exception
-    exc_class = ERROR_MAP.get(error_code, LuupError)
-    raise exc_class(f"[Error {error_code}] {error_msg}")
-
+    index = -error_code
+    exc_class = _ERROR_BY_INDEX[index] if 0 < index < len(_ERROR_BY_INDEX) else LuupError
+    raise exc_class(code=error_code, raw_message=raw_message)
@@ -5,20 +5,54 @@ Provides a Pythonic wrapper around the C model API with context management
 and automatic resource cleanup.
 """
 
-import atexit
+import ctypes
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any, Literal
+from typing import TYPE_CHECKING, Optional, Dict, Any, Literal
 
-# For Self type (Python 3.11+)
-try:
-    from typing import Self
-except ImportError:
+# Self is only needed by type checkers, so it isn't imported at runtime
+# (typing_extensions costs tens of milliseconds to import on Python < 3.11)
+if TYPE_CHECKING:
     from typing_extensions import Self
 
 from . import _native
+from ._native import (
+    luup_model_create_local,
+    luup_model_create_remote,
+    luup_model_warmup,
+    luup_model_warmup_ex,
+    luup_model_get_info,
+    luup_model_destroy,
+    last_error,
+    last_error_bytes,
+)
 from .exceptions import check_error, ModelNotFoundError, BackendInitError
 
 
+# LUUP_ASYNC_CLOSE values that leave asynchronous close off (compared
+# case-insensitively)
+_FALSE_FLAG_VALUES = ("", "0", "false", "no", "off")
+
+# Destroys models closed with LUUP_ASYNC_CLOSE enabled, created on first use.
+# Its worker is joined at interpreter exit, so pending destroys complete.
+_close_executor: Optional[ThreadPoolExecutor] = None
+_close_executor_lock = threading.Lock()
+
+
+def _destroy_in_background(handle: int) -> None:
+    """Queue luup_model_destroy(handle) on the background close worker."""
+    global _close_executor
+    with _close_executor_lock:
+        if _close_executor is None:
+            _close_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="luup-model-close"
+            )
+    _close_executor.submit(luup_model_destroy, handle)
+
+
 class Model:
     """
     LLM model for inference.
@@ -27,9 +61,8 @@ class Model:
     (OpenAI-compatible APIs).
     
     Examples:
-        >>> # Local model
+        >>> # Local model (warmed up on load)
         >>> model = Model.from_local("models/qwen-0.5b.gguf", gpu_layers=-1)
-        >>> model.warmup()
         >>> 
         >>> # With context manager
         >>> with Model.from_local("models/qwen-0.5b.gguf") as model:
@@ -43,6 +76,10 @@ class Model:
         ... )
     """
     
+    # The library copies the config strings, so only the handle and its
+    # bookkeeping are stored; __weakref__ is needed by weakref.finalize
+    __slots__ = ("_handle", "_closed", "_info", "_finalizer", "__weakref__")
+    
     def __init__(
         self,
         path: str | Path,
@@ -50,6 +87,8 @@ class Model:
         gpu_layers: int = -1,
         context_size: int = 2048,
         threads: int = 0,
+        n_batch: int = 512,
+        lock_memory: bool = False,
         api_key: Optional[str] = None,
         api_base_url: Optional[str] = None,
         backend: Literal["local", "remote"] = "local",
@@ -63,6 +102,10 @@ class Model:
                        -1 = auto (use all available), 0 = CPU only, N = specific count
             context_size: Context window size in tokens (default: 2048)
             threads: Number of CPU threads (0 = auto-detect based on CPU cores)
+            n_batch: Prompt tokens evaluated per decode call during prefill
+                    (local models only, 0 = library default)
+            lock_memory: Lock model weights in RAM so they aren't paged out
+                        between generations (local models only)
             api_key: API key for remote models (optional)
             api_base_url: Custom API endpoint for remote models (optional)
             backend: Backend type - "local" or "remote"
@@ -74,9 +117,15 @@ class Model:
         """
         self._handle: Optional[int] = None
         self._closed = False
+        self._info: Optional[Dict[str, Any]] = None
         
         # Convert path to string and encode
         path_str = str(path)
+        
+        # Fail fast on a missing file instead of going through backend setup
+        if backend == "local" and not os.path.isfile(path_str):
+            raise ModelNotFoundError(f"Model file not found: {path}")
+        
         path_bytes = path_str.encode('utf-8')
         api_key_bytes = api_key.encode('utf-8') if api_key else None
         api_base_url_bytes = api_base_url.encode('utf-8') if api_base_url else None
@@ -89,29 +138,25 @@ class Model:
             threads=threads,
             api_key=api_key_bytes,
             api_base_url=api_base_url_bytes,
+            n_batch=n_batch,
+            lock_memory=lock_memory,
         )
         
         # Create model using appropriate backend
         if backend == "local":
-            self._handle = _native._lib.luup_model_create_local(config)
+            self._handle = luup_model_create_local(ctypes.byref(config))
         else:  # remote
-            self._handle = _native._lib.luup_model_create_remote(config)
+            self._handle = luup_model_create_remote(ctypes.byref(config))
         
         if not self._handle:
-            error_msg = _native._lib.luup_get_last_error()
-            if error_msg:
-                msg = error_msg.decode('utf-8')
-            else:
-                msg = "Failed to create model"
-            
-            # Check if it's a file not found error for local models
-            if backend == "local" and not Path(path).exists():
-                raise ModelNotFoundError(f"Model file not found: {path}")
-            else:
-                raise BackendInitError(msg)
+            msg = last_error() or "Failed to create model"
+            raise BackendInitError(msg)
         
-        # Register cleanup
-        atexit.register(self.close)
+        # Destroy the handle when the model is collected (or at exit). The
+        # finalizer holds only the handle, so the model itself can be freed.
+        self._finalizer = weakref.finalize(
+            self, luup_model_destroy, self._handle
+        )
     
     @classmethod
     def from_local(
@@ -121,7 +166,10 @@ class Model:
         gpu_layers: int = -1,
         context_size: int = 2048,
         threads: int = 0,
-    ) -> Self:
+        n_batch: int = 512,
+        warmup: bool = True,
+        lock_memory: bool = False,
+    ) -> "Self":
         """
         Create a model from a local GGUF file using llama.cpp backend.
         
@@ -130,6 +178,11 @@ class Model:
             gpu_layers: GPU layers (-1 for auto, 0 for CPU only)
             context_size: Context window size in tokens
             threads: CPU threads (0 for auto)
+            n_batch: Prompt tokens per decode call (larger = faster prefill)
+            warmup: Run a dummy inference on load so weights are paged in and
+                   first-token latency is paid here instead of on the first
+                   query. Set to False to measure cold-start latency.
+            lock_memory: Lock model weights in RAM (mlock)
             
         Returns:
             Model instance
@@ -137,14 +190,26 @@ class Model:
         Raises:
             ModelNotFoundError: If model file doesn't exist
             BackendInitError: If llama.cpp initialization fails
+            InferenceError: If warmup fails
         """
-        return cls(
+        model = cls(
             path=path,
             gpu_layers=gpu_layers,
             context_size=context_size,
             threads=threads,
+            n_batch=n_batch,
+            lock_memory=lock_memory,
             backend="local",
         )
+        
+        if warmup:
+            try:
+                model.warmup()
+            except Exception:
+                model.close()
+                raise
+        
+        return model
     
     @classmethod
     def from_remote(
@@ -152,14 +217,19 @@ class Model:
         endpoint: str,
         api_key: str,
         *,
+        model: str = "gpt-4",
         context_size: int = 2048,
-    ) -> Self:
+    ) -> "Self":
         """
         Create a model using a remote OpenAI-compatible API.
         
+        The model keeps one keep-alive connection to the endpoint, so only
+        the first request pays for the TCP connect and TLS handshake.
+        
         Args:
             endpoint: API endpoint URL (e.g., "https://api.openai.com/v1")
             api_key: API key for authentication
+            model: Model name sent with each request (e.g., "gpt-4o-mini")
             context_size: Context window size in tokens
             
         Returns:
@@ -169,25 +239,41 @@ class Model:
             BackendInitError: If API initialization fails
         """
         return cls(
-            path=endpoint,
+            path=model,
             api_key=api_key,
+            api_base_url=endpoint,
             context_size=context_size,
             backend="remote",
         )
     
-    def warmup(self) -> None:
+    def warmup(self, n_tokens: int = 32) -> None:
         """
         Pre-warm the model by running a dummy inference.
         
         This reduces first-token latency for subsequent generations.
-        Recommended to call after model creation for better UX.
+        Models created with from_local() are warmed up automatically
+        unless warmup=False is passed.
+        
+        The library prefills an n_tokens-token dummy prompt and then decodes
+        one token. GPU backends (Metal, CUDA) set up kernels per batch shape
+        on first use, so warming with a prompt-sized batch as well as a single
+        token moves that cost off the first real request.
+        
+        Args:
+            n_tokens: Prompt tokens to prefill (capped to the context size).
+                Ignored by libraries that predate luup_model_warmup_ex, which
+                use their own fixed warmup prompt.
         
         Raises:
+            InvalidParameterError: If n_tokens is not positive
             InferenceError: If warmup fails
         """
         self._check_closed()
-        error_code = _native._lib.luup_model_warmup(self._handle)
-        check_error(error_code, _native._lib.luup_get_last_error)
+        if luup_model_warmup_ex is None:
+            error_code = luup_model_warmup(self._handle)
+        else:
+            error_code = luup_model_warmup_ex(self._handle, n_tokens)
+        check_error(error_code, last_error_bytes)
     
     def get_info(self) -> Dict[str, Any]:
         """
@@ -203,39 +289,61 @@ class Model:
                 
         Raises:
             InferenceError: If getting info fails
+        
+        The info is fixed once the model is created, so it is fetched from
+        the library on the first call and cached; each call returns a copy.
         """
         self._check_closed()
-        info = _native.CModelInfo()
-        error_code = _native._lib.luup_model_get_info(self._handle, info)
-        check_error(error_code, _native._lib.luup_get_last_error)
-        
-        return {
-            "backend": info.backend.decode('utf-8') if info.backend else "unknown",
-            "device": info.device.decode('utf-8') if info.device else "unknown",
-            "gpu_layers_loaded": info.gpu_layers_loaded,
-            "memory_usage": info.memory_usage,
-            "context_size": info.context_size,
-        }
+        if self._info is None:
+            info = _native.CModelInfo()
+            error_code = luup_model_get_info(
+                self._handle, ctypes.byref(info)
+            )
+            check_error(error_code, last_error_bytes)
+            
+            self._info = {
+                "backend": info.backend.decode('utf-8') if info.backend else "unknown",
+                "device": info.device.decode('utf-8') if info.device else "unknown",
+                "gpu_layers_loaded": info.gpu_layers_loaded,
+                "memory_usage": info.memory_usage,
+                "context_size": info.context_size,
+            }
+        
+        return dict(self._info)
     
     def close(self) -> None:
         """
         Explicitly close and free model resources.
         
-        Called automatically by context manager and destructor.
-        Safe to call multiple times.
+        Called automatically by the context manager, and when the model is
+        garbage collected. Safe to call multiple times.
+        
+        If the LUUP_ASYNC_CLOSE environment variable is set to a true value
+        (e.g. "1", "true", "yes"; unset, empty, "0", "false", "no" and "off"
+        leave it disabled), the library frees the model on a background
+        thread and close() returns at once, so e.g. loading the next model
+        overlaps with freeing this one. Any agents using the model must be
+        closed first.
         """
         if not self._closed and self._handle:
-            _native._lib.luup_model_destroy(self._handle)
+            async_close = os.environ.get("LUUP_ASYNC_CLOSE", "")
+            if async_close.strip().lower() not in _FALSE_FLAG_VALUES:
+                self._finalizer.detach()
+                _destroy_in_background(self._handle)
+            else:
+                self._finalizer()
             self._handle = None
             self._closed = True
+            self._info = None
     
     def _check_closed(self) -> None:
         """Raise error if model is closed."""
-        if self._closed or not self._handle:
+        # close() clears the handle, so it alone tells whether it is open
+        if not self._handle:
             raise ValueError("Model is closed")
     
     # Context manager protocol
-    def __enter__(self) -> Self:
+    def __enter__(self) -> "Self":
         """Enter context manager."""
         return self
     
@@ -243,11 +351,6 @@ class Model:
         """Exit context manager and cleanup."""
         self.close()
     
-    # Destructor
-    def __del__(self) -> None:
-        """Cleanup on garbage collection."""
-        self.close()
-    
     def __repr__(self) -> str:
         """String representation."""
         status = "closed" if self._closed else "open"
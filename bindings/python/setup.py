@@ -33,6 +33,9 @@ setup(
         "typing-extensions>=4.0.0; python_version<'3.10'",
     ],
     extras_require={
+        "fast": [
+            "orjson>=3.6.0",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "pytest-asyncio>=0.21.0",
@@ -4,8 +4,12 @@ Tests for Agent class.
 
 import pytest
 import asyncio
+import gc
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-from luup_agent import Agent
+from luup_agent import Agent, HttpError, Model
 
 
 def test_agent_creation(agent):
@@ -46,6 +50,93 @@ def test_agent_generate_stream(agent):
     assert len(full_response) > 0
 
 
+def test_agent_generate_stream_truncated(model):
+    """Test streams cut off by max_tokens end on a character boundary."""
+    # Emoji and CJK text take several tokens per character, so some of these
+    # limits stop generation in the middle of a character
+    for max_tokens in range(1, 17):
+        with Agent(model, max_tokens=max_tokens, enable_builtin_tools=False) as agent:
+            tokens = list(agent.generate_stream("Reply with emoji and 中文 only"))
+            
+            # generate_stream() decodes each token strictly, so an incomplete
+            # tail would raise above; the history holds the streamed text
+            assert agent.get_history()[-1]["content"] == "".join(tokens)
+
+
+def test_agent_generate_stream_early_exit(agent):
+    """Test that stopping a stream early leaves the agent usable."""
+    stream = agent.generate_stream("Tell me a story")
+    next(stream, None)
+    stream.close()
+    
+    assert isinstance(agent.generate("Hello"), str)
+
+
+def test_agent_generate_stream_shared_model(model):
+    """Test using the same model between stream tokens doesn't deadlock."""
+    def consume():
+        with Agent(model, max_tokens=512, enable_builtin_tools=False) as streamer, \
+                Agent(model, max_tokens=8, enable_builtin_tools=False) as other:
+            stream = streamer.generate_stream("Tell me a long story")
+            next(stream)
+            # Blocks on the model until the stream has finished, while the
+            # worker keeps handing tokens over
+            results.append(other.generate("Hello"))
+            model.warmup(n_tokens=1)
+            results.append("".join(stream))
+    
+    results = []
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout=120)
+    
+    assert not thread.is_alive()
+    assert len(results) == 2
+
+
+def test_agent_generate_stream_bytes(agent):
+    """Test streaming generation of raw UTF-8 tokens."""
+    chunks = list(agent.generate_stream_bytes("Count to 3"))
+    
+    assert len(chunks) > 0
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    
+    # Each chunk ends on a character boundary, and joined chunks decode as
+    # a whole response
+    for chunk in chunks:
+        chunk.decode('utf-8')
+    assert len(b''.join(chunks).decode('utf-8')) > 0
+
+
+def test_agent_generate_without_generate_ex(agent, monkeypatch):
+    """Test generation against a library that predates luup_agent_generate_ex."""
+    from luup_agent import agent as agent_module
+    
+    monkeypatch.setattr(agent_module, "luup_agent_generate_ex", None)
+    response = agent.generate("Say hello")
+    
+    assert isinstance(response, str)
+    assert len(response) > 0
+    
+    monkeypatch.setattr(agent_module, "luup_agent_generate_batch", None)
+    with pytest.raises(NotImplementedError):
+        agent.generate_many(["Say hello"])
+
+
+def test_agent_generate_many(agent):
+    """Test batched generation of independent messages."""
+    history_len = len(agent.get_history())
+    
+    responses = agent.generate_many(["Say hello", "Say goodbye", "Count to 3"])
+    
+    assert len(responses) == 3
+    assert all(isinstance(response, str) for response in responses)
+    
+    # Batched messages don't become part of the conversation
+    assert len(agent.get_history()) == history_len
+    assert agent.generate_many([]) == []
+
+
 @pytest.mark.asyncio
 async def test_agent_generate_async(agent):
     """Test async streaming generation."""
@@ -62,6 +153,19 @@ async def test_agent_generate_async(agent):
     assert len(full_response) > 0
 
 
+@pytest.mark.asyncio
+async def test_agent_generate_async_early_exit(agent):
+    """Test leaving an async stream early stops generation cleanly."""
+    stream = agent.generate_async("Tell me a long story")
+    async for _token in stream:
+        break
+    await stream.aclose()
+    
+    # The agent is usable again once the producer has stopped
+    response = agent.generate("Say hi")
+    assert isinstance(response, str)
+
+
 def test_agent_history(agent):
     """Test conversation history management."""
     # Initially empty (or just system prompt)
@@ -89,6 +193,25 @@ def test_agent_history(agent):
     assert len(history) == initial_len
 
 
+def test_agent_history_cache(agent):
+    """Test that cached history stays in sync with the agent."""
+    agent.add_message("user", "Hello")
+    history = agent.get_history()
+    history_len = len(history)
+    
+    # Mutating the returned list doesn't affect the agent
+    history[-1]["content"] = "changed"
+    history.append({"role": "user", "content": "extra"})
+    assert agent.get_history()[-1]["content"] == "Hello"
+    
+    # Generation updates the history
+    agent.generate("How are you?")
+    assert len(agent.get_history()) == history_len + 2
+    
+    list(agent.generate_stream("Tell me more"))
+    assert len(agent.get_history()) == history_len + 4
+
+
 def test_agent_close(model):
     """Test agent cleanup."""
     agent = Agent(model, system_prompt="Test")
@@ -103,6 +226,23 @@ def test_agent_close(model):
         agent.generate("test")
 
 
+def test_agent_finalizer(model):
+    """Test the handle is released on close and on garbage collection."""
+    agent = Agent(model)
+    finalizer = agent._finalizer
+    assert finalizer.alive
+    
+    agent.close()
+    assert not finalizer.alive
+    agent.close()  # Second close is a no-op
+    
+    agent = Agent(model)
+    finalizer = agent._finalizer
+    del agent
+    gc.collect()
+    assert not finalizer.alive
+
+
 def test_agent_repr(agent):
     """Test agent string representation."""
     repr_str = repr(agent)
@@ -111,3 +251,50 @@ def test_agent_repr(agent):
     assert "open" in repr_str or "closed" in repr_str
     assert "tools=" in repr_str
 
+
+class _DroppedStreamHandler(BaseHTTPRequestHandler):
+    """Streams two tokens, then drops the connection mid-response."""
+    
+    protocol_version = "HTTP/1.1"
+    requests = 0
+    
+    def do_POST(self):
+        type(self).requests += 1
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in ("Hel", "lo"):
+            event = {"choices": [{"delta": {"content": token}}]}
+            data = f"data: {json.dumps(event)}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        # No terminating chunk: the client sees the connection close
+        self.close_connection = True
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_agent_stream_connection_lost():
+    """Test a stream cut off mid-response fails without replaying tokens."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DroppedStreamHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        with Model.from_remote(endpoint=endpoint, api_key="test") as model:
+            with Agent(model, enable_builtin_tools=False) as agent:
+                tokens = []
+                with pytest.raises(HttpError):
+                    for token in agent.generate_stream("Hi"):
+                        tokens.append(token)
+        
+        # Only the streamed tokens were delivered, and no non-streaming
+        # retry was sent
+        assert "".join(tokens) == "Hello"
+        assert _DroppedStreamHandler.requests == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -2,18 +2,34 @@
 Tests for Model class.
 """
 
+import gc
 import pytest
 from pathlib import Path
 
 from luup_agent import Model, ModelNotFoundError, BackendInitError
+from luup_agent.exceptions import check_error, InferenceError, InvalidParameterError
 
 
 def test_model_not_found():
     """Test that ModelNotFoundError is raised for nonexistent file."""
-    with pytest.raises((ModelNotFoundError, FileNotFoundError)):
+    with pytest.raises(ModelNotFoundError, match="nonexistent_model.gguf"):
         Model.from_local("nonexistent_model.gguf")
 
 
+def test_check_error_message():
+    """Test C error codes map to exceptions with the library's message."""
+    check_error(0, lambda: b"unused")
+    
+    with pytest.raises(InferenceError) as exc_info:
+        check_error(-4, lambda: "d\u00e9code failed".encode('utf-8'))
+    assert exc_info.value.code == -4
+    assert str(exc_info.value) == "[Error -4] d\u00e9code failed"
+    assert exc_info.value.args == ("[Error -4] d\u00e9code failed",)
+    
+    with pytest.raises(InferenceError, match=r"\[Error -4\] Unknown error"):
+        check_error(-4, lambda: b"")
+
+
 def test_model_creation(model_path):
     """Test model creation from local file."""
     model = Model.from_local(
@@ -62,12 +78,30 @@ def test_model_get_info(model):
     # Check values
     assert len(info["backend"]) > 0
     assert info["context_size"] > 0
+    
+    # Cached after the first call; callers get their own copy
+    info["backend"] = "changed"
+    assert model.get_info() != info
+    assert model.get_info() == model.get_info()
 
 
 def test_model_warmup(model):
     """Test model warmup."""
     # Should not raise
     model.warmup()
+    model.warmup(n_tokens=1)
+    model.warmup(n_tokens=4096)  # Capped to the context size
+    
+    with pytest.raises(InvalidParameterError):
+        model.warmup(n_tokens=0)
+
+
+def test_model_warmup_without_warmup_ex(model, monkeypatch):
+    """Test warmup against a library that predates luup_model_warmup_ex."""
+    from luup_agent import model as model_module
+    
+    monkeypatch.setattr(model_module, "luup_model_warmup_ex", None)
+    model.warmup(n_tokens=8)  # Should not raise
 
 
 def test_model_double_close(model_path):
@@ -82,6 +116,59 @@ def test_model_double_close(model_path):
     assert model._closed
 
 
+def test_model_finalizer(model_path):
+    """Test the handle is released on close and on garbage collection."""
+    model = Model.from_local(model_path, gpu_layers=0, warmup=False)
+    finalizer = model._finalizer
+    assert finalizer.alive
+    
+    model.close()
+    assert not finalizer.alive
+    
+    model = Model.from_local(model_path, gpu_layers=0, warmup=False)
+    finalizer = model._finalizer
+    del model
+    gc.collect()
+    assert not finalizer.alive
+
+
+def test_model_async_close(model_path, monkeypatch):
+    """Test LUUP_ASYNC_CLOSE frees the model on the background worker."""
+    from luup_agent import model as model_module
+    
+    monkeypatch.setenv("LUUP_ASYNC_CLOSE", "1")
+    model = Model.from_local(model_path, gpu_layers=0, warmup=False)
+    finalizer = model._finalizer
+    
+    model.close()
+    assert model._closed
+    assert not finalizer.alive
+    
+    # Wait for the queued destroy to run
+    model_module._close_executor.submit(lambda: None).result()
+
+
+def test_model_async_close_flag(model_path, monkeypatch):
+    """Test LUUP_ASYNC_CLOSE is parsed as a boolean flag."""
+    from luup_agent import model as model_module
+    
+    queued = []
+    
+    def destroy_in_background(handle):
+        queued.append(handle)
+        model_module.luup_model_destroy(handle)
+    
+    monkeypatch.setattr(model_module, "_destroy_in_background", destroy_in_background)
+    
+    for value, enabled in (("0", False), ("false", False), ("No", False),
+                           ("", False), ("1", True), ("TRUE", True)):
+        monkeypatch.setenv("LUUP_ASYNC_CLOSE", value)
+        model = Model.from_local(model_path, gpu_layers=0, warmup=False)
+        queued.clear()
+        model.close()
+        assert bool(queued) == enabled, value
+
+
 def test_model_operations_after_close(model_path):
     """Test that operations fail after model is closed."""
     model = Model.from_local(model_path, gpu_layers=0)
@@ -101,3 +188,17 @@ def test_model_repr(model):
     assert "Model" in repr_str
     assert "open" in repr_str or "closed" in repr_str
 
+
+def test_model_custom_n_batch(model_path):
+    """Test model creation with a custom prefill batch size."""
+    with Model.from_local(model_path, gpu_layers=0, context_size=512, n_batch=64) as model:
+        assert not model._closed
+        model.warmup()
+
+
+def test_model_without_warmup(model_path):
+    """Test that warmup on load can be disabled."""
+    with Model.from_local(model_path, gpu_layers=0, warmup=False) as model:
+        assert not model._closed
+        # Explicit warmup still works
+        model.warmup()
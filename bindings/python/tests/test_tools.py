@@ -4,6 +4,10 @@ Tests for tool calling functionality.
 
 import pytest
 import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from luup_agent import Agent, Model
 
 
 def test_tool_registration(agent):
@@ -50,6 +54,84 @@ def test_tool_with_multiple_params(agent):
     assert add(3, 4) == 7
 
 
+def test_tool_definition(agent):
+    """Test the stored tool definition."""
+    @agent.tool(description="Scale a value")
+    def scale(value: float, factor: int = 2) -> float:
+        return value * factor
+    
+    tool = agent._tools["scale"]
+    assert tool.name == "scale"
+    assert tool.description == "Scale a value"
+    assert tool.handler is scale
+    assert tool.param_types == (float, int)
+    assert json.loads(tool.parameters_json)["required"] == ["value"]
+    
+    # JSON arguments are coerced to the annotated types
+    assert tool.call({"value": "1.5"}) == 3.0
+    assert tool.call({"value": 1.5, "factor": 3.0}) == 4.5
+    assert isinstance(tool.call({"value": 2, "factor": 2}), float)
+    
+    # Exact conversions only; unexpected arguments are rejected
+    with pytest.raises(TypeError):
+        tool.call({"value": 1.5, "factor": 3.9})
+    with pytest.raises(TypeError):
+        tool.call({"value": 1.5, "scale": 2})
+    
+    # Definitions are immutable
+    with pytest.raises(AttributeError):
+        tool.name = "other"
+
+
+def test_tool_argument_coercion(agent):
+    """Test JSON arguments are converted to the annotated types."""
+    @agent.tool(description="Echo arguments")
+    def echo(flag: bool, count: int, ratio: float, label: str) -> list:
+        return [flag, count, ratio, label]
+    
+    call = agent._tools["echo"].call
+    
+    # Values of the right type pass through unchanged
+    args = {"flag": False, "count": 3, "ratio": 0.5, "label": "x"}
+    assert call(args) == [False, 3, 0.5, "x"]
+    
+    # Booleans accept only real booleans or "true"/"false"
+    assert call({**args, "flag": "false"})[0] is False
+    assert call({**args, "flag": "true"})[0] is True
+    for value in ("yes", 1, None):
+        with pytest.raises(TypeError):
+            call({**args, "flag": value})
+    
+    # Integers accept integral values only
+    assert call({**args, "count": 4.0})[1] == 4
+    assert call({**args, "count": "5"})[1] == 5
+    with pytest.raises(TypeError):
+        call({**args, "count": 3.9})
+    with pytest.raises(ValueError):
+        call({**args, "count": "3.9"})
+    with pytest.raises(TypeError):
+        call({**args, "count": True})
+    
+    # Unexpected keys are rejected rather than dropped
+    with pytest.raises(TypeError, match="unexpected arguments: extra"):
+        call({**args, "extra": 1})
+
+
+def test_tool_with_unhashable_annotations(agent):
+    """Test tools whose annotations can't be hashed still register."""
+    @agent.tool(description="Unhashable annotations")
+    def tagged(delay: {"unit": "s"}, items: ["str"]) -> list:
+        return [delay, items]
+    
+    tool = agent._tools["tagged"]
+    schema = json.loads(tool.parameters_json)
+    assert schema["properties"]["delay"]["type"] == "string"
+    assert schema["properties"]["items"]["type"] == "string"
+    
+    # Values for unhashable annotations pass through unchanged
+    assert tool.call({"delay": 2.5, "items": ["a"]}) == [2.5, ["a"]]
+
+
 def test_tool_with_optional_params(agent):
     """Test tool with optional parameters."""
     @agent.tool(description="Greet someone")
@@ -96,8 +178,15 @@ def test_tool_schema_generation(agent):
     
     assert "complex_func" in agent._tools
     
-    # Schema should have been generated (stored internally)
-    # We can verify by checking the tool was registered successfully
+    # Schema should have been generated from the annotations
+    schema = json.loads(agent._tools["complex_func"].parameters_json)
+    assert {name: prop["type"] for name, prop in schema["properties"].items()} == {
+        "name": "string",
+        "age": "integer",
+        "active": "boolean",
+        "score": "number",
+        "tags": "array",
+    }
 
 
 def test_tool_with_explicit_schema(agent):
@@ -164,3 +253,50 @@ def test_tool_error_handling(agent):
     with pytest.raises(ValueError, match="Tool failed"):
         failing_tool()
 
+
+class _ChatReplyHandler(BaseHTTPRequestHandler):
+    """Answers chat completion requests with the queued replies, in order."""
+    
+    protocol_version = "HTTP/1.1"
+    replies = []
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        reply = type(self).replies.pop(0)
+        body = json.dumps({"choices": [{"message": {"content": reply}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_tool_call_after_unclosed_braces():
+    """Test a tool call is found after many braces that are never closed."""
+    call = json.dumps({"name": "probe", "parameters": {"x": 1}})
+    _ChatReplyHandler.replies = ["{ text " * 20000 + call, "done"]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatReplyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        with Model.from_remote(endpoint=endpoint, api_key="test") as model:
+            with Agent(model, enable_builtin_tools=False) as agent:
+                calls = []
+                
+                @agent.tool(description="Record a call")
+                def probe(x: int) -> dict:
+                    calls.append(x)
+                    return {"ok": True}
+                
+                # The scan is linear in the output length, so the open
+                # braces don't make parsing quadratic
+                assert agent.generate("Hi") == "done"
+        
+        assert calls == [1]
+    finally:
+        server.shutdown()
+        server.server_close()
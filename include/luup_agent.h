@@ -96,6 +96,8 @@ typedef struct {
     int threads;                   /**< CPU threads (0 for auto-detect) */
     const char* api_key;           /**< API key for remote models (optional) */
     const char* api_base_url;      /**< Custom API endpoint (optional) */
+    int n_batch;                   /**< Prompt tokens evaluated per decode call (0 for default: 512) */
+    bool lock_memory;              /**< Lock model weights in RAM (mlock) so they aren't paged out */
 } luup_model_config;
 
 /**
@@ -134,6 +136,21 @@ LUUP_API luup_model* luup_model_create_remote(const luup_model_config* config);
  */
 LUUP_API luup_error_t luup_model_warmup(luup_model* model);
 
+/**
+ * @brief Pre-warm model with a prompt of a given length
+ * 
+ * Decodes an n_tokens-token dummy prompt followed by one single-token
+ * decode step, so both the prefill and the decode paths have run once
+ * (GPU backends compile or select kernels per batch shape on first use).
+ * luup_model_warmup() is equivalent to n_tokens = 32. The prompt is capped
+ * to the context size.
+ * 
+ * @param model Model handle
+ * @param n_tokens Number of prompt tokens to prefill (must be positive)
+ * @return LUUP_SUCCESS or error code
+ */
+LUUP_API luup_error_t luup_model_warmup_ex(luup_model* model, int n_tokens);
+
 /**
  * @brief Get model information
  * @param model Model handle
@@ -254,6 +271,47 @@ LUUP_API luup_error_t luup_agent_generate_stream(
  */
 LUUP_API char* luup_agent_generate(luup_agent* agent, const char* user_message);
 
+/**
+ * @brief Generate response (blocking), also returning its length
+ * 
+ * Same as luup_agent_generate(), but stores the length of the response in
+ * bytes (excluding the terminating NUL) in out_length, so bindings can
+ * copy it without scanning for the terminator.
+ * 
+ * @param agent Agent handle
+ * @param user_message User's input message
+ * @param out_length Receives the response length on success (may be NULL)
+ * @return Generated response (caller must free with luup_free_string) or NULL on error
+ */
+LUUP_API char* luup_agent_generate_ex(
+    luup_agent* agent,
+    const char* user_message,
+    size_t* out_length
+);
+
+/**
+ * @brief Generate responses to several independent messages (blocking)
+ * 
+ * Each message is answered as the next user turn after the current
+ * conversation, without seeing the other messages. The conversation
+ * history is not modified. Local models decode all messages together as
+ * parallel sequences, so each step reads the weights once for the batch.
+ * Tool calls are executed per message as in luup_agent_generate().
+ * 
+ * @param agent Agent handle
+ * @param user_messages Array of n_messages input messages
+ * @param n_messages Number of messages
+ * @param responses Output array of n_messages responses (caller must free each
+ *                  with luup_free_string). Entries are NULL on error.
+ * @return LUUP_SUCCESS or error code
+ */
+LUUP_API luup_error_t luup_agent_generate_batch(
+    luup_agent* agent,
+    const char** user_messages,
+    int n_messages,
+    char** responses
+);
+
 /**
  * @brief Manually add a message to conversation history
  * @param agent Agent handle
@@ -327,7 +385,8 @@ LUUP_API void luup_agent_destroy(luup_agent* agent);
  * @brief Free string allocated by library
  * 
  * Use this to free strings returned by:
- * - luup_agent_generate()
+ * - luup_agent_generate() / luup_agent_generate_ex()
+ * - luup_agent_generate_batch()
  * - luup_agent_get_history_json()
  * - Tool callbacks return values
  * 
@@ -335,6 +394,18 @@ LUUP_API void luup_agent_destroy(luup_agent* agent);
  */
 LUUP_API void luup_free_string(char* str);
 
+/**
+ * @brief Copy a string into memory owned by the library
+ * 
+ * Tool callbacks must return strings that luup_free_string() can release.
+ * Bindings that cannot call the library's allocator directly (e.g. Python
+ * ctypes) use this to build their callback return values.
+ * 
+ * @param str NUL-terminated string to copy
+ * @return Newly allocated copy (free with luup_free_string) or NULL on error
+ */
+LUUP_API char* luup_strdup(const char* str);
+
 // ============================================================================
 // Version Information
 // ============================================================================
@@ -8,10 +8,26 @@
 #include <llama.h>
 #include <string>
 #include <vector>
+#include <algorithm>
 #include <cstdio>
 #include <cstring>
+#include <mutex>
 #include <thread>
 
+#if defined(__unix__) || defined(__APPLE__)
+#include <fcntl.h>
+#include <unistd.h>
+#endif
+
+#if defined(LUUP_BACKEND_DL)
+#if defined(_WIN32)
+#define NOMINMAX
+#include <windows.h>
+#else
+#include <dlfcn.h>
+#endif
+#endif
+
 // Backend data structure for llama.cpp
 struct llama_backend_data {
     llama_model* model;
@@ -21,11 +37,27 @@ struct llama_backend_data {
     int gpu_layers_loaded;
     size_t memory_usage;
     
+    // Reusable batch for prompt prefill and decoding (holds n_batch tokens)
+    llama_batch batch;
+    int n_batch;
+    
+    // Tokens currently held in the KV cache for sequence 0. Each prompt
+    // only evaluates what follows its longest common prefix with these.
+    std::vector<llama_token> cached_tokens;
+    
+    // Serializes access to ctx/sampler so agents sharing a model can
+    // generate from different threads
+    std::mutex mutex;
+    
     llama_backend_data() 
         : model(nullptr), ctx(nullptr), sampler(nullptr),
-          device_type("CPU"), gpu_layers_loaded(0), memory_usage(0) {}
+          device_type("CPU"), gpu_layers_loaded(0), memory_usage(0),
+          batch(), n_batch(0) {}
     
     ~llama_backend_data() {
+        if (batch.token) {
+            llama_batch_free(batch);
+        }
         if (sampler) {
             llama_sampler_free(sampler);
         }
@@ -42,61 +74,416 @@ namespace {
     // Global initialization flag
     bool llama_initialized = false;
     
+    // Number of sequences the KV cache can hold at once for batched generation
+    const int MAX_PARALLEL_SEQUENCES = 8;
+    
+#if defined(LUUP_BACKEND_DL)
+    // Directory containing this library, where the ggml backend modules
+    // (e.g. libggml-cpu-haswell.so) are installed next to it
+    std::string library_dir() {
+        std::string path;
+#if defined(_WIN32)
+        HMODULE module = nullptr;
+        if (GetModuleHandleExA(GET_MODULE_HANDLE_EX_FLAG_FROM_ADDRESS |
+                               GET_MODULE_HANDLE_EX_FLAG_UNCHANGED_REFCOUNT,
+                               reinterpret_cast<LPCSTR>(&library_dir), &module)) {
+            char buf[MAX_PATH];
+            DWORD n = GetModuleFileNameA(module, buf, MAX_PATH);
+            path.assign(buf, n);
+        }
+        const size_t sep = path.find_last_of("\\/");
+#else
+        Dl_info info;
+        if (dladdr(reinterpret_cast<void*>(&library_dir), &info) && info.dli_fname) {
+            path = info.dli_fname;
+        }
+        const size_t sep = path.find_last_of('/');
+#endif
+        return sep == std::string::npos ? std::string(".") : path.substr(0, sep);
+    }
+#endif
+    
     // Initialize llama.cpp backend once
     void ensure_llama_initialized() {
         if (!llama_initialized) {
+#if defined(LUUP_BACKEND_DL)
+            // Load the best CPU variant for this machine (plus any GPU
+            // backend modules that were built)
+            ggml_backend_load_all_from_path(library_dir().c_str());
+#endif
             llama_backend_init();
             llama_initialized = true;
         }
     }
     
-    // Detect available GPU backend
+    // Devices llama.cpp can offload layers to (discrete or integrated GPUs)
+    bool is_gpu_device(ggml_backend_dev_t dev) {
+        const enum ggml_backend_dev_type type = ggml_backend_dev_type(dev);
+        return type == GGML_BACKEND_DEVICE_TYPE_GPU || type == GGML_BACKEND_DEVICE_TYPE_IGPU;
+    }
+    
+    // Detect available GPU backend at runtime: the name of the backend
+    // registering the first GPU device (e.g. "CUDA", "ROCm", "Vulkan")
     std::string detect_gpu_backend() {
-#if defined(__APPLE__) && defined(GGML_USE_METAL)
-        return "Metal";
-#elif defined(GGML_USE_CUDA)
-        return "CUDA";
-#elif defined(GGML_USE_HIPBLAS)
-        return "ROCm";
-#elif defined(GGML_USE_VULKAN)
-        return "Vulkan";
-#else
+        if (llama_supports_gpu_offload()) {
+            for (size_t i = 0; i < ggml_backend_dev_count(); i++) {
+                ggml_backend_dev_t dev = ggml_backend_dev_get(i);
+                if (is_gpu_device(dev)) {
+                    return ggml_backend_reg_name(ggml_backend_dev_backend_reg(dev));
+                }
+            }
+        }
         return "CPU";
-#endif
     }
     
-    // Auto-detect optimal number of GPU layers
-    int auto_detect_gpu_layers(llama_model* model) {
-        // Get total layers in model
-        int n_layers = llama_model_n_layer(model);
+    // Read an integer GGUF metadata value, or 0 if it is missing or not a
+    // scalar (some architectures store per-layer arrays)
+    uint64_t gguf_get_uint(const gguf_context* meta, const std::string& key) {
+        const int64_t id = gguf_find_key(meta, key.c_str());
+        if (id < 0) {
+            return 0;
+        }
+        switch (gguf_get_kv_type(meta, id)) {
+            case GGUF_TYPE_UINT32:
+                return gguf_get_val_u32(meta, id);
+            case GGUF_TYPE_INT32:
+                return static_cast<uint64_t>(std::max(0, gguf_get_val_i32(meta, id)));
+            case GGUF_TYPE_UINT64:
+                return gguf_get_val_u64(meta, id);
+            default:
+                return 0;
+        }
+    }
+    
+    // Auto-detect the number of layers to offload (-1 = all). Compares the
+    // free memory of the GPU devices with the weights and KV cache size read
+    // from the GGUF header, so the model itself is only loaded once.
+    int auto_detect_gpu_layers(const char* model_path, int n_ctx) {
+        if (!llama_supports_gpu_offload()) {
+            return 0;
+        }
+        
+        size_t free_mem = 0;
+        for (size_t i = 0; i < ggml_backend_dev_count(); i++) {
+            ggml_backend_dev_t dev = ggml_backend_dev_get(i);
+            if (is_gpu_device(dev)) {
+                size_t free = 0;
+                size_t total = 0;
+                ggml_backend_dev_memory(dev, &free, &total);
+                free_mem += free;
+            }
+        }
+        if (free_mem == 0) {
+            // Device doesn't report memory: offload everything
+            return -1;
+        }
+        
+        // Only the header is parsed; no tensor data is read
+        gguf_init_params params = {true, nullptr};
+        gguf_context* meta = gguf_init_from_file(model_path, params);
+        if (!meta) {
+            return -1;
+        }
+        
+        std::string arch;
+        const int64_t arch_id = gguf_find_key(meta, "general.architecture");
+        if (arch_id >= 0 && gguf_get_kv_type(meta, arch_id) == GGUF_TYPE_STRING) {
+            arch = gguf_get_val_str(meta, arch_id);
+        }
+        const uint64_t n_layer = gguf_get_uint(meta, arch + ".block_count");
+        const uint64_t n_embd = gguf_get_uint(meta, arch + ".embedding_length");
+        const uint64_t n_head = gguf_get_uint(meta, arch + ".attention.head_count");
+        uint64_t n_head_kv = gguf_get_uint(meta, arch + ".attention.head_count_kv");
+        if (n_head_kv == 0) {
+            n_head_kv = n_head;
+        }
+        
+        uint64_t weights_size = 0;
+        for (int64_t i = 0; i < gguf_get_n_tensors(meta); i++) {
+            weights_size += gguf_get_tensor_size(meta, i);
+        }
+        gguf_free(meta);
+        
+        if (n_layer == 0) {
+            return -1;
+        }
         
-        // Try to offload all layers to GPU if available
-        std::string backend = detect_gpu_backend();
-        if (backend != "CPU") {
-            return n_layers;
+        // F16 K and V for every layer, plus a tenth of free memory for
+        // compute buffers
+        const uint64_t kv_size = n_head > 0
+            ? 2 * 2 * n_layer * static_cast<uint64_t>(n_ctx) * (n_embd * n_head_kv / n_head)
+            : 0;
+        const uint64_t reserve = kv_size + free_mem / 10;
+        if (weights_size + reserve <= free_mem) {
+            return -1;
+        }
+        if (reserve >= free_mem) {
+            return 0;
         }
         
-        return 0;
+        // Weights are spread roughly evenly over the layers (plus the
+        // embedding and output tensors)
+        const uint64_t layer_size = std::max<uint64_t>(1, weights_size / (n_layer + 1));
+        return static_cast<int>(std::min(n_layer, (free_mem - reserve) / layer_size));
     }
     
-    // Check if file exists
-    bool file_exists(const char* path) {
+    // Check that the model file can be opened. Where supported, also ask
+    // the kernel to start reading it into the page cache, so the weights
+    // stream in while llama.cpp is still parsing the GGUF header
+    bool open_model_file(const char* path) {
+#if defined(POSIX_FADV_WILLNEED)
+        int fd = open(path, O_RDONLY);
+        if (fd < 0) {
+            return false;
+        }
+        posix_fadvise(fd, 0, 0, POSIX_FADV_WILLNEED);
+        close(fd);
+        return true;
+#else
         FILE* f = fopen(path, "rb");
         if (f) {
             fclose(f);
             return true;
         }
         return false;
+#endif
+    }
+    
+    // Length of the longest prefix of s that does not end in the middle of
+    // a UTF-8 sequence (token pieces can split multi-byte characters)
+    size_t utf8_complete_length(const std::string& s) {
+        const size_t n = s.size();
+        for (size_t i = 1; i <= 4 && i <= n; i++) {
+            unsigned char c = static_cast<unsigned char>(s[n - i]);
+            if ((c & 0xC0) == 0x80) {
+                continue;  // Continuation byte, keep looking for the lead byte
+            }
+            size_t len = (c & 0x80) == 0x00 ? 1
+                       : (c & 0xE0) == 0xC0 ? 2
+                       : (c & 0xF0) == 0xE0 ? 3
+                       : (c & 0xF8) == 0xF0 ? 4 : 1;
+            return len > i ? n - i : n;
+        }
+        return n;
+    }
+    
+    // Tokenize text into out. Returns false if the text produces no tokens.
+    bool tokenize(const llama_vocab* vocab, const char* text, std::vector<llama_token>& out) {
+        const int text_len = static_cast<int>(strlen(text));
+        
+        // A first pass without a buffer returns the negated token count
+        int n_tokens = -llama_tokenize(vocab, text, text_len, nullptr, 0, true, true);
+        if (n_tokens <= 0) {
+            return false;
+        }
+        
+        out.resize(n_tokens);
+        return llama_tokenize(vocab, text, text_len, out.data(), n_tokens, true, true) == n_tokens;
+    }
+    
+    // Append a token for one sequence to a batch
+    void batch_add(llama_batch& batch, llama_token token, llama_pos pos, bool logits,
+                   llama_seq_id seq_id = 0) {
+        batch.token[batch.n_tokens] = token;
+        batch.pos[batch.n_tokens] = pos;
+        batch.n_seq_id[batch.n_tokens] = 1;
+        batch.seq_id[batch.n_tokens][0] = seq_id;
+        batch.logits[batch.n_tokens] = logits;
+        batch.n_tokens++;
+    }
+    
+    // Evaluate tokens[start, end) for a sequence, in chunks of at most n_batch
+    // tokens per llama_decode call. Only the token at end - 1 requests logits,
+    // so the output projection is skipped for all others. Positions before
+    // start must already be in the KV cache.
+    bool decode_prompt(llama_backend_data* backend,
+                       const std::vector<llama_token>& tokens, int start, int end,
+                       llama_seq_id seq_id = 0) {
+        for (int i = start; i < end; i += backend->n_batch) {
+            const int n_chunk = std::min(backend->n_batch, end - i);
+            
+            backend->batch.n_tokens = 0;
+            for (int j = 0; j < n_chunk; j++) {
+                batch_add(backend->batch, tokens[i + j], i + j,
+                          i + j == end - 1, seq_id);
+            }
+            
+            if (llama_decode(backend->ctx, backend->batch) != 0) {
+                return false;
+            }
+        }
+        
+        return true;
+    }
+    
+    // Empty the KV cache, e.g. after a failed decode left it in an unknown state
+    void reset_cache(llama_backend_data* backend) {
+        llama_memory_clear(llama_get_memory(backend->ctx), true);
+        backend->cached_tokens.clear();
+    }
+    
+    // Drop everything in the KV cache after its longest common prefix with
+    // tokens (keeping at most max_keep positions) and return the number of
+    // cached positions that were kept
+    int reuse_cached_prefix(llama_backend_data* backend,
+                            const std::vector<llama_token>& tokens, size_t max_keep) {
+        const std::vector<llama_token>& cached = backend->cached_tokens;
+        size_t n_keep = 0;
+        while (n_keep < cached.size() && n_keep < max_keep &&
+               cached[n_keep] == tokens[n_keep]) {
+            n_keep++;
+        }
+        
+        llama_memory_t mem = llama_get_memory(backend->ctx);
+        if (!llama_memory_seq_rm(mem, 0, static_cast<llama_pos>(n_keep), -1)) {
+            // Memory types that can't be truncated are cleared instead
+            llama_memory_clear(mem, true);
+            n_keep = 0;
+        }
+        backend->cached_tokens.resize(n_keep);
+        
+        return static_cast<int>(n_keep);
+    }
+    
+    // A prompt being decoded as one sequence of a batch
+    struct Sequence {
+        std::vector<llama_token> tokens;  // Prompt followed by decoded output
+        llama_token next;                 // Sampled but not yet decoded
+        int n_generated;
+        bool done;
+        
+        Sequence() : next(0), n_generated(0), done(false) {}
+    };
+    
+    // Generate responses for up to MAX_PARALLEL_SEQUENCES prompts as parallel
+    // sequences. The prefix shared by all prompts is evaluated once, then every
+    // step decodes the newest token of each unfinished sequence in one batch.
+    bool generate_sequences(llama_backend_data* backend, const std::string* prompts,
+                            int n_seqs, int max_tokens, std::string* responses) {
+        const llama_vocab* vocab = llama_model_get_vocab(backend->model);
+        llama_memory_t mem = llama_get_memory(backend->ctx);
+        const int n_ctx = static_cast<int>(llama_n_ctx(backend->ctx));
+        const int max_gen = max_tokens > 0 ? max_tokens : 512;
+        
+        std::vector<Sequence> seqs(n_seqs);
+        for (int i = 0; i < n_seqs; i++) {
+            if (!tokenize(vocab, prompts[i].c_str(), seqs[i].tokens)) {
+                luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to tokenize prompt");
+                return false;
+            }
+        }
+        
+        // Longest prefix common to all prompts, leaving every sequence at
+        // least one token of its own to produce logits from
+        const std::vector<llama_token>& first = seqs[0].tokens;
+        size_t n_common = first.size() - 1;
+        for (int i = 1; i < n_seqs; i++) {
+            const std::vector<llama_token>& tokens = seqs[i].tokens;
+            size_t n = 0;
+            while (n < n_common && n < tokens.size() - 1 && tokens[n] == first[n]) {
+                n++;
+            }
+            n_common = n;
+        }
+        
+        size_t n_prompt_cells = n_common;
+        for (const auto& seq : seqs) {
+            n_prompt_cells += seq.tokens.size() - n_common;
+        }
+        if (n_prompt_cells >= static_cast<size_t>(n_ctx)) {
+            luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Prompts exceed context window");
+            return false;
+        }
+        
+        // Evaluate the shared prefix once in sequence 0 and let the other
+        // sequences reference the same KV cells
+        int n_keep = reuse_cached_prefix(backend, first, n_common);
+        if (!decode_prompt(backend, first, n_keep, static_cast<int>(n_common))) {
+            reset_cache(backend);
+            luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to decode prompt");
+            return false;
+        }
+        for (int i = 1; i < n_seqs; i++) {
+            llama_memory_seq_cp(mem, 0, i, 0, static_cast<llama_pos>(n_common));
+        }
+        
+        // Evaluate the rest of each prompt and sample its first token
+        for (int i = 0; i < n_seqs; i++) {
+            const int n_tokens = static_cast<int>(seqs[i].tokens.size());
+            if (!decode_prompt(backend, seqs[i].tokens, static_cast<int>(n_common), n_tokens, i)) {
+                reset_cache(backend);
+                luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to decode prompt");
+                return false;
+            }
+            seqs[i].next = llama_sampler_sample(backend->sampler, backend->ctx, -1);
+        }
+        
+        std::vector<int> active;
+        while (true) {
+            // Queue the pending token of every sequence that keeps going
+            backend->batch.n_tokens = 0;
+            active.clear();
+            for (int i = 0; i < n_seqs; i++) {
+                Sequence& seq = seqs[i];
+                if (seq.done) {
+                    continue;
+                }
+                const int n_past = static_cast<int>(seq.tokens.size());
+                if (seq.n_generated >= max_gen || n_past >= n_ctx ||
+                    llama_vocab_is_eog(vocab, seq.next)) {
+                    seq.done = true;
+                    continue;
+                }
+                
+                char buf[256];
+                int n = llama_token_to_piece(vocab, seq.next, buf, sizeof(buf), 0, true);
+                if (n > 0) {
+                    responses[i].append(buf, n);
+                }
+                
+                batch_add(backend->batch, seq.next, n_past, true, i);
+                active.push_back(i);
+            }
+            
+            if (active.empty()) {
+                break;
+            }
+            
+            if (llama_decode(backend->ctx, backend->batch) != 0) {
+                // Out of KV space: stop all sequences with what they have
+                for (int i : active) {
+                    llama_memory_seq_rm(mem, i, static_cast<llama_pos>(seqs[i].tokens.size()), -1);
+                }
+                break;
+            }
+            
+            // Logits for the k-th queued token are at batch index k
+            for (size_t k = 0; k < active.size(); k++) {
+                Sequence& seq = seqs[active[k]];
+                seq.tokens.push_back(seq.next);
+                seq.n_generated++;
+                seq.next = llama_sampler_sample(backend->sampler, backend->ctx, static_cast<int>(k));
+            }
+        }
+        
+        // Sequence 0 stays cached for the next call; release the others
+        for (int i = 1; i < n_seqs; i++) {
+            llama_memory_seq_rm(mem, i, -1, -1);
+        }
+        backend->cached_tokens = seqs[0].tokens;
+        
+        return true;
     }
 }
 
 // Initialize llama.cpp backend with given model
 void* llama_backend_init(const char* model_path, int gpu_layers, 
-                         int context_size, int threads) {
+                         int context_size, int threads, int n_batch,
+                         bool lock_memory) {
     ensure_llama_initialized();
     
-    // Check if model file exists
-    if (!file_exists(model_path)) {
+    // Check if model file exists (and start readahead)
+    if (!open_model_file(model_path)) {
         luup_set_error(LUUP_ERROR_MODEL_NOT_FOUND, 
                       ("Model file not found: " + std::string(model_path)).c_str());
         return nullptr;
@@ -107,19 +494,15 @@ void* llama_backend_init(const char* model_path, int gpu_layers,
         
         // Set up model parameters
         llama_model_params model_params = llama_model_default_params();
+        if (lock_memory) {
+            // Keep mmap'd weights resident between generations
+            model_params.load_mode = LLAMA_LOAD_MODE_MMAP_MLOCK;
+        }
         
         // Configure GPU layers
+        const int n_ctx = context_size > 0 ? context_size : 2048;
         if (gpu_layers == -1) {
-            // Auto-detect: load model first to count layers
-            llama_model* temp_model = llama_model_load_from_file(model_path, model_params);
-            if (!temp_model) {
-                luup_set_error(LUUP_ERROR_BACKEND_INIT_FAILED, 
-                              "Failed to load model for GPU layer detection");
-                delete backend;
-                return nullptr;
-            }
-            model_params.n_gpu_layers = auto_detect_gpu_layers(temp_model);
-            llama_model_free(temp_model);
+            model_params.n_gpu_layers = auto_detect_gpu_layers(model_path, n_ctx);
         } else {
             model_params.n_gpu_layers = gpu_layers;
         }
@@ -135,10 +518,20 @@ void* llama_backend_init(const char* model_path, int gpu_layers,
         
         // Set up context parameters
         llama_context_params ctx_params = llama_context_default_params();
-        ctx_params.n_ctx = context_size > 0 ? context_size : 2048;
+        ctx_params.n_ctx = n_ctx;
         ctx_params.n_threads = threads > 0 ? threads : std::thread::hardware_concurrency();
         ctx_params.n_threads_batch = ctx_params.n_threads;
         
+        // Allow several sequences for batched generation. One unified KV
+        // buffer keeps the full context available to a single sequence.
+        ctx_params.n_seq_max = MAX_PARALLEL_SEQUENCES;
+        ctx_params.kv_unified = true;
+        
+        // Prompt prefill batch size (logical and physical), capped by context
+        backend->n_batch = std::min<int>(n_batch > 0 ? n_batch : 512, ctx_params.n_ctx);
+        ctx_params.n_batch = backend->n_batch;
+        ctx_params.n_ubatch = backend->n_batch;
+        
         // Create context
         backend->ctx = llama_init_from_model(backend->model, ctx_params);
         if (!backend->ctx) {
@@ -148,6 +541,9 @@ void* llama_backend_init(const char* model_path, int gpu_layers,
             return nullptr;
         }
         
+        // Allocate the batch once; it is reused for every decode call
+        backend->batch = llama_batch_init(backend->n_batch, 0, 1);
+        
         // Create sampler with default parameters
         backend->sampler = llama_sampler_chain_init(llama_sampler_chain_default_params());
         llama_sampler_chain_add(backend->sampler, 
@@ -157,7 +553,10 @@ void* llama_backend_init(const char* model_path, int gpu_layers,
         
         // Store backend info
         backend->device_type = detect_gpu_backend();
-        backend->gpu_layers_loaded = model_params.n_gpu_layers;
+        const int n_layer = llama_model_n_layer(backend->model);
+        backend->gpu_layers_loaded = !llama_supports_gpu_offload() ? 0
+            : model_params.n_gpu_layers < 0 ? n_layer
+            : std::min(model_params.n_gpu_layers, n_layer);
         
         // Estimate memory usage
         size_t model_size = llama_model_size(backend->model);
@@ -201,14 +600,16 @@ bool llama_backend_get_info(void* backend_data, const char** device,
     return true;
 }
 
-// Perform warmup inference
-bool llama_backend_warmup(void* backend_data) {
+// Perform warmup inference: prefill an n_tokens-token prompt, then decode
+// one sampled token, so both batch shapes have been through the backend
+bool llama_backend_warmup(void* backend_data, int n_tokens) {
     if (!backend_data) {
         luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid backend data");
         return false;
     }
     
     auto backend = static_cast<llama_backend_data*>(backend_data);
+    std::lock_guard<std::mutex> lock(backend->mutex);
     
     try {
         // Tokenize a simple warmup prompt
@@ -219,45 +620,39 @@ bool llama_backend_warmup(void* backend_data) {
         const llama_vocab* vocab = llama_model_get_vocab(backend->model);
         
         // Tokenize
-        int n_tokens = llama_tokenize(
-            vocab,
-            warmup_prompt,
-            strlen(warmup_prompt),
-            nullptr,
-            0,
-            true,  // add_special
-            true   // parse_special
-        );
-        
-        if (n_tokens <= 0) {
+        if (!tokenize(vocab, warmup_prompt, tokens)) {
             luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to tokenize warmup prompt");
             return false;
         }
         
-        tokens.resize(n_tokens);
-        llama_tokenize(
-            vocab,
-            warmup_prompt,
-            strlen(warmup_prompt),
-            tokens.data(),
-            tokens.size(),
-            true,
-            true
-        );
-        
-        // Create batch
-        llama_batch batch = llama_batch_get_one(tokens.data(), tokens.size());
+        // Repeat the prompt's last token up to the requested length, leaving
+        // room in the context for the decode step
+        const int n_ctx = static_cast<int>(llama_n_ctx(backend->ctx));
+        const int n_prompt = std::max(1, std::min(n_tokens, n_ctx - 1));
+        tokens.resize(n_prompt, tokens.back());
         
         // Decode (process prompt)
-        if (llama_decode(backend->ctx, batch) != 0) {
+        reset_cache(backend);
+        if (!decode_prompt(backend, tokens, 0, n_prompt)) {
+            reset_cache(backend);
             luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to decode warmup prompt");
             return false;
         }
         
-        // Sample one token
+        // Sample one token and run it through a single-token decode
         llama_token new_token = llama_sampler_sample(backend->sampler, backend->ctx, -1);
+        backend->batch.n_tokens = 0;
+        batch_add(backend->batch, new_token, n_prompt, true);
+        if (llama_decode(backend->ctx, backend->batch) != 0) {
+            reset_cache(backend);
+            luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to decode warmup token");
+            return false;
+        }
         
-        // Note: KV cache will be cleared at start of next generation
+        // Record what the KV cache now holds; the next prompt reuses any
+        // common prefix (typically just BOS) and overwrites the rest
+        tokens.push_back(new_token);
+        backend->cached_tokens = tokens;
         
         luup_clear_error();
         return true;
@@ -271,61 +666,64 @@ bool llama_backend_warmup(void* backend_data) {
 // Generate text (basic implementation)
 char* llama_backend_generate(void* backend_data, const char* prompt, 
                              float temperature, int max_tokens) {
+    return llama_backend_generate_stream(backend_data, prompt, temperature,
+                                         max_tokens, nullptr, nullptr);
+}
+
+// Generate text, passing each decoded piece to callback (if set) as soon as it
+// forms complete UTF-8. Returns the full response.
+char* llama_backend_generate_stream(void* backend_data, const char* prompt,
+                                    float temperature, int max_tokens,
+                                    void (*callback)(const char* token, void* user_data),
+                                    void* user_data) {
     if (!backend_data || !prompt) {
         luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid parameters");
         return nullptr;
     }
     
     auto backend = static_cast<llama_backend_data*>(backend_data);
+    std::lock_guard<std::mutex> lock(backend->mutex);
     
     try {
-        // Note: For simplicity, we create fresh context for each generation
-        // In production, you'd want to manage KV cache more efficiently
-        
         // Get vocab from model
         const llama_vocab* vocab = llama_model_get_vocab(backend->model);
         
         // Tokenize prompt
         std::vector<llama_token> tokens;
-        int n_tokens = llama_tokenize(
-            vocab,
-            prompt,
-            strlen(prompt),
-            nullptr,
-            0,
-            true,
-            true
-        );
-        
-        if (n_tokens <= 0) {
+        if (!tokenize(vocab, prompt, tokens)) {
             luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to tokenize prompt");
             return nullptr;
         }
+        const int n_tokens = static_cast<int>(tokens.size());
+        
+        const int n_ctx = static_cast<int>(llama_n_ctx(backend->ctx));
+        if (n_tokens >= n_ctx) {
+            luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Prompt exceeds context window");
+            return nullptr;
+        }
         
-        tokens.resize(n_tokens);
-        llama_tokenize(
-            vocab,
-            prompt,
-            strlen(prompt),
-            tokens.data(),
-            tokens.size(),
-            true,
-            true
-        );
+        // The prompt carries the full conversation, which usually starts with
+        // what the previous call already evaluated (system prompt, tool schema,
+        // earlier turns). Keep that part of the KV cache and only process the rest.
+        // The last prompt token is always re-evaluated to get fresh logits.
+        int n_keep = reuse_cached_prefix(backend, tokens, tokens.size() - 1);
         
         // Process prompt
-        llama_batch batch = llama_batch_get_one(tokens.data(), tokens.size());
-        if (llama_decode(backend->ctx, batch) != 0) {
+        if (!decode_prompt(backend, tokens, n_keep, n_tokens)) {
+            reset_cache(backend);
             luup_set_error(LUUP_ERROR_INFERENCE_FAILED, "Failed to decode prompt");
             return nullptr;
         }
+        backend->cached_tokens = tokens;
+        int n_past = n_tokens;
         
         // Generate tokens
         std::string response;
+        size_t n_streamed = 0;
         int n_generated = 0;
         int max_gen = max_tokens > 0 ? max_tokens : 512;
         
-        while (n_generated < max_gen) {
+        while (n_generated < max_gen && n_past < n_ctx) {
             // Sample next token
             llama_token new_token = llama_sampler_sample(backend->sampler, backend->ctx, -1);
             
@@ -339,17 +737,36 @@ char* llama_backend_generate(void* backend_data, const char* prompt,
             int n = llama_token_to_piece(vocab, new_token, buf, sizeof(buf), 0, true);
             if (n > 0) {
                 response.append(buf, n);
+                
+                if (callback) {
+                    size_t n_complete = utf8_complete_length(response);
+                    if (n_complete > n_streamed) {
+                        std::string piece = response.substr(n_streamed, n_complete - n_streamed);
+                        callback(piece.c_str(), user_data);
+                        n_streamed = n_complete;
+                    }
+                }
             }
             
             // Prepare next batch with single token
-            batch = llama_batch_get_one(&new_token, 1);
-            if (llama_decode(backend->ctx, batch) != 0) {
+            backend->batch.n_tokens = 0;
+            batch_add(backend->batch, new_token, n_past, true);
+            if (llama_decode(backend->ctx, backend->batch) != 0) {
+                // Drop the position whose state is now uncertain
+                llama_memory_seq_rm(llama_get_memory(backend->ctx), 0, n_past, -1);
                 break;
             }
+            backend->cached_tokens.push_back(new_token);
+            n_past++;
             
             n_generated++;
         }
         
+        // Generation can stop in the middle of a multi-byte character
+        // (max_tokens, context full, decode failure). Drop that incomplete
+        // tail rather than pass invalid UTF-8 to the callback or the history.
+        response.resize(utf8_complete_length(response));
+        
         // Allocate and return result
         char* result = static_cast<char*>(malloc(response.size() + 1));
         if (result) {
@@ -366,3 +783,40 @@ char* llama_backend_generate(void* backend_data, const char* prompt,
     }
 }
 
+// Generate a response for each prompt. Prompts are decoded together as
+// parallel sequences (in groups of up to MAX_PARALLEL_SEQUENCES), so each
+// decode step reads the model weights once for the whole group.
+bool llama_backend_generate_batch(void* backend_data,
+                                  const std::vector<std::string>& prompts,
+                                  float temperature, int max_tokens,
+                                  std::vector<std::string>& responses) {
+    if (!backend_data || prompts.empty()) {
+        luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid parameters");
+        return false;
+    }
+    
+    auto backend = static_cast<llama_backend_data*>(backend_data);
+    std::lock_guard<std::mutex> lock(backend->mutex);
+    
+    try {
+        const int group_size = std::min<int>(
+            static_cast<int>(llama_n_seq_max(backend->ctx)), backend->n_batch);
+        const int n_prompts = static_cast<int>(prompts.size());
+        
+        responses.assign(prompts.size(), std::string());
+        for (int first = 0; first < n_prompts; first += group_size) {
+            const int n_seqs = std::min(group_size, n_prompts - first);
+            if (!generate_sequences(backend, &prompts[first], n_seqs, max_tokens,
+                                    &responses[first])) {
+                return false;
+            }
+        }
+        
+        luup_clear_error();
+        return true;
+        
+    } catch (const std::exception& e) {
+        luup_set_error(LUUP_ERROR_INFERENCE_FAILED, e.what());
+        return false;
+    }
+}
@@ -10,6 +10,7 @@
 #include <string>
 #include <sstream>
 #include <memory>
+#include <mutex>
 #include <regex>
 #include <cstring>
 
@@ -22,6 +23,13 @@ struct openai_backend_data {
     std::string model_name;
     int context_size;
     
+    // Persistent keep-alive connection, reused across requests so only the
+    // first call pays for the TCP connect and TLS handshake
+    std::unique_ptr<httplib::Client> client;
+    std::mutex client_mutex;  // httplib clients don't support concurrent requests
+    std::string chat_path;
+    httplib::Headers headers;
+    
     openai_backend_data(const char* endpoint, const char* key, const char* model, int ctx_size)
         : api_endpoint(endpoint ? endpoint : "https://api.openai.com/v1"),
           api_key(key ? key : ""),
@@ -103,6 +111,54 @@ namespace {
         return "";
     }
     
+    // Forward every complete SSE line in buffer to the callback and keep the
+    // trailing partial line for the next chunk
+    // Returns true if at least one token was passed to callback
+    bool drain_sse_lines(std::string& buffer,
+                         void (*callback)(const char* token, void* user_data),
+                         void* user_data) {
+        bool emitted = false;
+        size_t pos = 0;
+        size_t newline_pos;
+        while ((newline_pos = buffer.find('\n', pos)) != std::string::npos) {
+            std::string line = buffer.substr(pos, newline_pos - pos);
+            pos = newline_pos + 1;
+            
+            if (!line.empty() && line.back() == '\r') {
+                line.pop_back();
+            }
+            
+            // Skip empty lines and non-data fields
+            std::string data_str = parse_sse_data(line);
+            if (data_str.empty()) {
+                continue;
+            }
+            
+            // Extract content from chunk
+            std::string content = extract_streaming_content(data_str);
+            if (!content.empty()) {
+                callback(content.c_str(), user_data);
+                emitted = true;
+            }
+        }
+        buffer.erase(0, pos);
+        return emitted;
+    }
+    
+    // Append the API's error message (if any) to a failed status description
+    void append_api_error(std::string& error_msg, const std::string& body) {
+        try {
+            auto error_json = json::parse(body);
+            if (error_json.contains("error") && error_json["error"].contains("message")) {
+                error_msg += ": " + error_json["error"]["message"].get<std::string>();
+            }
+        } catch (...) {
+            if (!body.empty()) {
+                error_msg += ": " + body;
+            }
+        }
+    }
+    
     // Extract tool calls from response
     std::string extract_tool_calls(const json& response) {
         try {
@@ -162,6 +218,24 @@ void* openai_backend_init(const char* api_endpoint, const char* api_key,
         // Create backend data
         auto backend = new openai_backend_data(endpoint, api_key, model_name, context_size);
         
+        // Requests go to the /chat/completions endpoint
+        backend->chat_path = parsed.path;
+        if (backend->chat_path.back() != '/') {
+            backend->chat_path += "/";
+        }
+        backend->chat_path += "chat/completions";
+        
+        backend->headers = {
+            {"Content-Type", "application/json"},
+            {"Authorization", "Bearer " + backend->api_key}
+        };
+        
+        // The connection itself is opened lazily by the first request
+        backend->client = std::make_unique<httplib::Client>(
+            parsed.scheme + "://" + parsed.host + ":" + std::to_string(parsed.port));
+        backend->client->set_keep_alive(true);
+        backend->client->set_connection_timeout(30, 0);  // 30 seconds
+        
         // Test connection with a simple request (optional, but good for validation)
         // For now, we'll just validate the parameters and return
         
@@ -192,13 +266,6 @@ char* openai_backend_generate(void* backend_data, const char* prompt,
     auto backend = static_cast<openai_backend_data*>(backend_data);
     
     try {
-        // Parse endpoint URL
-        ParsedURL parsed;
-        if (!parse_url(backend->api_endpoint, parsed)) {
-            luup_set_error(LUUP_ERROR_HTTP_FAILED, "Invalid API endpoint URL");
-            return nullptr;
-        }
-        
         // Build request body
         json request_body = {
             {"model", backend->model_name},
@@ -215,31 +282,13 @@ char* openai_backend_generate(void* backend_data, const char* prompt,
         
         std::string body_str = request_body.dump();
         
-        // Build headers
-        httplib::Headers headers = {
-            {"Content-Type", "application/json"},
-            {"Authorization", "Bearer " + backend->api_key}
-        };
-        
-        // Make request to /chat/completions endpoint
-        std::string endpoint_path = parsed.path;
-        if (endpoint_path.back() != '/') {
-            endpoint_path += "/";
-        }
-        endpoint_path += "chat/completions";
-        
-        // Create HTTP client and make request
+        // Make request on the shared connection
         httplib::Result response;
-        if (parsed.scheme == "https") {
-            httplib::SSLClient client(parsed.host, parsed.port);
-            client.set_connection_timeout(30, 0);  // 30 seconds
-            client.set_read_timeout(120, 0);       // 120 seconds for generation
-            response = client.Post(endpoint_path, headers, body_str, "application/json");
-        } else {
-            httplib::Client client(parsed.host, parsed.port);
-            client.set_connection_timeout(30, 0);
-            client.set_read_timeout(120, 0);
-            response = client.Post(endpoint_path, headers, body_str, "application/json");
+        {
+            std::lock_guard<std::mutex> lock(backend->client_mutex);
+            backend->client->set_read_timeout(120, 0);  // 120 seconds for generation
+            response = backend->client->Post(backend->chat_path, backend->headers,
+                                             body_str, "application/json");
         }
         
         if (!response) {
@@ -252,14 +301,7 @@ char* openai_backend_generate(void* backend_data, const char* prompt,
                                    std::to_string(response->status);
             
             // Try to extract error message from response
-            try {
-                auto error_json = json::parse(response->body);
-                if (error_json.contains("error") && error_json["error"].contains("message")) {
-                    error_msg += ": " + error_json["error"]["message"].get<std::string>();
-                }
-            } catch (...) {
-                error_msg += ": " + response->body;
-            }
+            append_api_error(error_msg, response->body);
             
             luup_set_error(LUUP_ERROR_HTTP_FAILED, error_msg.c_str());
             return nullptr;
@@ -327,7 +369,14 @@ char* openai_backend_generate(void* backend_data, const char* prompt,
 bool openai_backend_generate_stream(void* backend_data, const char* prompt,
                                     float temperature, int max_tokens,
                                     void (*callback)(const char* token, void* user_data),
-                                    void* user_data) {
+                                    void* user_data, bool* out_streamed) {
+    // Set once any token has reached the callback, so the caller knows a
+    // failure happened mid-stream and must not be retried
+    bool streamed = false;
+    if (out_streamed) {
+        *out_streamed = false;
+    }
+    
     if (!backend_data || !prompt || !callback) {
         luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid parameters");
         return false;
@@ -336,13 +385,6 @@ bool openai_backend_generate_stream(void* backend_data, const char* prompt,
     auto backend = static_cast<openai_backend_data*>(backend_data);
     
     try {
-        // Parse endpoint URL
-        ParsedURL parsed;
-        if (!parse_url(backend->api_endpoint, parsed)) {
-            luup_set_error(LUUP_ERROR_HTTP_FAILED, "Invalid API endpoint URL");
-            return false;
-        }
-        
         // Build request body
         json request_body = {
             {"model", backend->model_name},
@@ -359,35 +401,47 @@ bool openai_backend_generate_stream(void* backend_data, const char* prompt,
         
         std::string body_str = request_body.dump();
         
-        // Build headers
-        httplib::Headers headers = {
-            {"Content-Type", "application/json"},
-            {"Authorization", "Bearer " + backend->api_key}
+        // Parse the SSE stream as it arrives and call callback for each token
+        httplib::Request request;
+        request.method = "POST";
+        request.path = backend->chat_path;
+        request.headers = backend->headers;
+        request.body = body_str;
+        
+        int status = 0;
+        std::string sse_buffer;
+        std::string error_body;
+        request.response_handler = [&](const httplib::Response& res) {
+            status = res.status;
+            return true;
+        };
+        request.content_receiver = [&](const char* data, size_t data_length,
+                                       uint64_t /*offset*/, uint64_t /*total_length*/) {
+            if (status != 200) {
+                error_body.append(data, data_length);
+                return true;
+            }
+            sse_buffer.append(data, data_length);
+            if (drain_sse_lines(sse_buffer, callback, user_data)) {
+                streamed = true;
+                if (out_streamed) {
+                    *out_streamed = true;
+                }
+            }
+            return true;
         };
         
-        // Build endpoint path
-        std::string endpoint_path = parsed.path;
-        if (endpoint_path.back() != '/') {
-            endpoint_path += "/";
-        }
-        endpoint_path += "chat/completions";
-        
-        // Create HTTP client and make streaming request
         httplib::Result response;
-        if (parsed.scheme == "https") {
-            httplib::SSLClient client(parsed.host, parsed.port);
-            client.set_connection_timeout(30, 0);
-            client.set_read_timeout(300, 0);  // Longer timeout for streaming
-            response = client.Post(endpoint_path, headers, body_str, "application/json");
-        } else {
-            httplib::Client client(parsed.host, parsed.port);
-            client.set_connection_timeout(30, 0);
-            client.set_read_timeout(300, 0);
-            response = client.Post(endpoint_path, headers, body_str, "application/json");
+        {
+            std::lock_guard<std::mutex> lock(backend->client_mutex);
+            backend->client->set_read_timeout(300, 0);  // Longer timeout for streaming
+            response = backend->client->send(request);
         }
         
         if (!response) {
-            luup_set_error(LUUP_ERROR_HTTP_FAILED, "Failed to connect to API endpoint");
+            luup_set_error(LUUP_ERROR_HTTP_FAILED, streamed
+                ? "Connection to API endpoint lost during streaming"
+                : "Failed to connect to API endpoint");
             return false;
         }
         
@@ -396,52 +450,16 @@ bool openai_backend_generate_stream(void* backend_data, const char* prompt,
                                    std::to_string(response->status);
             
             // Try to extract error message from response
-            try {
-                auto error_json = json::parse(response->body);
-                if (error_json.contains("error") && error_json["error"].contains("message")) {
-                    error_msg += ": " + error_json["error"]["message"].get<std::string>();
-                }
-            } catch (...) {
-                if (!response->body.empty()) {
-                    error_msg += ": " + response->body;
-                }
-            }
+            append_api_error(error_msg, error_body);
             
             luup_set_error(LUUP_ERROR_HTTP_FAILED, error_msg.c_str());
             return false;
         }
         
-        // Parse SSE response and call callback for each token
-        std::string buffer = response->body;
-        size_t pos = 0;
-        
-        while (pos < buffer.size()) {
-            // Find next newline
-            size_t newline_pos = buffer.find('\n', pos);
-            if (newline_pos == std::string::npos) {
-                // Process remaining data
-                newline_pos = buffer.size();
-            }
-            
-            std::string line = buffer.substr(pos, newline_pos - pos);
-            pos = newline_pos + 1;
-            
-            // Skip empty lines
-            if (line.empty() || line == "\r") {
-                continue;
-            }
-            
-            // Parse SSE data
-            std::string data_str = parse_sse_data(line);
-            if (data_str.empty()) {
-                continue;
-            }
-            
-            // Extract content from chunk
-            std::string content = extract_streaming_content(data_str);
-            if (!content.empty()) {
-                callback(content.c_str(), user_data);
-            }
+        // Process a final line that wasn't newline-terminated
+        if (!sse_buffer.empty()) {
+            sse_buffer += '\n';
+            drain_sse_lines(sse_buffer, callback, user_data);
         }
         
         luup_clear_error();
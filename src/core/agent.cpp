@@ -55,11 +55,64 @@ struct luup_agent {
     std::vector<Message> history;
     std::map<std::string, ToolInfo> tools;
     
+    // Tool schema prompt text, rebuilt only after the tool set changes
+    std::string tool_schema;
+    bool tool_schema_dirty;
+    
     luup_agent() : model(nullptr), temperature(0.7f), max_tokens(0),
                    enable_tool_calling(true), enable_history_management(true),
-                   enable_builtin_tools(true) {}
+                   enable_builtin_tools(true), tool_schema_dirty(true) {}
 };
 
+// Return the tool schema for the prompt, generating it on first use
+static const std::string& get_tool_schema(luup_agent* agent) {
+    if (agent->tool_schema_dirty) {
+        agent->tool_schema = generate_tool_schema(agent->tools);
+        agent->tool_schema_dirty = false;
+    }
+    return agent->tool_schema;
+}
+
+// Build the prompt for a turn from history, which already ends with
+// user_message when history management is enabled
+static std::string build_prompt(luup_agent* agent, const std::vector<Message>& history,
+                                const char* user_message) {
+    std::string prompt;
+    if (agent->enable_history_management) {
+        prompt = format_chat_history(history);
+    } else if (!agent->system_prompt.empty()) {
+        // No history - just use system prompt + user message
+        prompt = "System: " + agent->system_prompt + "\n\nUser: " + 
+                 std::string(user_message) + "\n\nAssistant: ";
+    } else {
+        prompt = "User: " + std::string(user_message) + "\n\nAssistant: ";
+    }
+    
+    // Insert tool schema after system prompt if tools are registered and enabled
+    if (agent->enable_tool_calling && !agent->tools.empty()) {
+        size_t insert_pos = prompt.find("User:");
+        if (insert_pos != std::string::npos) {
+            prompt.insert(insert_pos, get_tool_schema(agent));
+        }
+    }
+    
+    return prompt;
+}
+
+// Build the prompt for user_message as the next turn after the current
+// history, without adding it to the history
+static std::string build_turn_prompt(luup_agent* agent, const char* user_message) {
+    if (!agent->enable_history_management) {
+        return build_prompt(agent, agent->history, user_message);
+    }
+    std::vector<Message> turn = agent->history;
+    Message msg;
+    msg.role = "user";
+    msg.content = user_message;
+    turn.push_back(msg);
+    return build_prompt(agent, turn, user_message);
+}
+
 extern "C" {
 
 luup_agent* luup_agent_create(const luup_agent_config* config) {
@@ -123,6 +176,7 @@ luup_error_t luup_agent_register_tool(
         info.user_data = user_data;
         
         agent->tools[tool->name] = info;
+        agent->tool_schema_dirty = true;
         
         return LUUP_SUCCESS;
     } catch (const std::exception& e) {
@@ -152,31 +206,8 @@ luup_error_t luup_agent_generate_stream(
         }
         
         // Build the prompt from conversation history
-        std::string prompt;
-        if (agent->enable_history_management) {
-            prompt = format_chat_history(agent->history);
-        } else {
-            // No history - just use system prompt + user message
-            if (!agent->system_prompt.empty()) {
-                prompt = "System: " + agent->system_prompt + "\n\nUser: " + 
-                         std::string(user_message) + "\n\nAssistant: ";
-            } else {
-                prompt = "User: " + std::string(user_message) + "\n\nAssistant: ";
-            }
-        }
-        
-        // Add tool schema if tools are registered and enabled
-        if (agent->enable_tool_calling && !agent->tools.empty()) {
-            std::string tool_schema = generate_tool_schema(agent->tools);
-            // Insert tool schema after system prompt
-            size_t insert_pos = prompt.find("User:");
-            if (insert_pos != std::string::npos) {
-                prompt.insert(insert_pos, tool_schema);
-            }
-        }
+        std::string prompt = build_prompt(agent, agent->history, user_message);
         
-        // For now, use blocking generation and simulate streaming
-        // TODO: Implement true token-by-token streaming in future
         void* backend_data = luup_model_get_backend_data(agent->model);
         if (!backend_data) {
             luup_set_error(LUUP_ERROR_INVALID_PARAM, "Model backend not initialized");
@@ -185,13 +216,15 @@ luup_error_t luup_agent_generate_stream(
         
         // For remote models, try to use streaming backend if available
         if (!luup_model_is_local(agent->model)) {
+            bool streamed = false;
             bool success = openai_backend_generate_stream(
                 backend_data,
                 prompt.c_str(),
                 agent->temperature,
                 agent->max_tokens,
                 callback,
-                user_data
+                user_data,
+                &streamed
             );
             
             if (success) {
@@ -205,10 +238,47 @@ luup_error_t luup_agent_generate_stream(
                 luup_clear_error();
                 return LUUP_SUCCESS;
             }
-            // Fall back to non-streaming if streaming fails
+            
+            // Part of the response already reached the callback; repeating
+            // it through the non-streaming path would deliver it twice
+            if (streamed) {
+                return LUUP_ERROR_HTTP_FAILED;
+            }
+            
+            // Fall back to non-streaming if streaming failed before any token
+        }
+        
+        // Tool calls are parsed from the complete response, so tokens can only
+        // be streamed live from the local backend when no tools can be invoked
+        bool tools_active = agent->enable_tool_calling && !agent->tools.empty();
+        if (luup_model_is_local(agent->model) && !tools_active) {
+            char* streamed_raw = llama_backend_generate_stream(
+                backend_data,
+                prompt.c_str(),
+                agent->temperature,
+                agent->max_tokens,
+                callback,
+                user_data
+            );
+            
+            if (!streamed_raw) {
+                return LUUP_ERROR_INFERENCE_FAILED;
+            }
+            
+            // Add assistant response to history
+            if (agent->enable_history_management) {
+                Message msg;
+                msg.role = "assistant";
+                msg.content = streamed_raw;
+                agent->history.push_back(msg);
+            }
+            
+            free(streamed_raw);
+            luup_clear_error();
+            return LUUP_SUCCESS;
         }
         
-        // For local models or fallback, use non-streaming generation
+        // For local models with tools or fallback, use non-streaming generation
         char* response_raw = luup_model_is_local(agent->model) 
             ? llama_backend_generate(
                 backend_data,
@@ -261,7 +331,7 @@ luup_error_t luup_agent_generate_stream(
             }
         }
         
-        // Simulate streaming by calling callback with full response
+        // With tools active the final response is delivered in one piece
         callback(response.c_str(), user_data);
         
         // Add assistant response to history
@@ -280,7 +350,12 @@ luup_error_t luup_agent_generate_stream(
     }
 }
 
-char* luup_agent_generate(luup_agent* agent, const char* user_message) {
+/**
+ * @brief Generate a response, optionally reporting its length
+ * 
+ * Shared implementation of luup_agent_generate() and luup_agent_generate_ex().
+ */
+static char* generate_response(luup_agent* agent, const char* user_message, size_t* out_length) {
     if (!agent || !user_message) {
         luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid parameters for generation");
         return nullptr;
@@ -296,28 +371,7 @@ char* luup_agent_generate(luup_agent* agent, const char* user_message) {
         }
         
         // Build the prompt from conversation history
-        std::string prompt;
-        if (agent->enable_history_management) {
-            prompt = format_chat_history(agent->history);
-        } else {
-            // No history - just use system prompt + user message
-            if (!agent->system_prompt.empty()) {
-                prompt = "System: " + agent->system_prompt + "\n\nUser: " + 
-                         std::string(user_message) + "\n\nAssistant: ";
-            } else {
-                prompt = "User: " + std::string(user_message) + "\n\nAssistant: ";
-            }
-        }
-        
-        // Add tool schema if tools are registered and enabled
-        if (agent->enable_tool_calling && !agent->tools.empty()) {
-            std::string tool_schema = generate_tool_schema(agent->tools);
-            // Insert tool schema after system prompt
-            size_t insert_pos = prompt.find("User:");
-            if (insert_pos != std::string::npos) {
-                prompt.insert(insert_pos, tool_schema);
-            }
-        }
+        std::string prompt = build_prompt(agent, agent->history, user_message);
         
         // Generate response
         void* backend_data = luup_model_get_backend_data(agent->model);
@@ -378,7 +432,7 @@ char* luup_agent_generate(luup_agent* agent, const char* user_message) {
                 
                 // Recursively generate final response
                 // (In real implementation, you'd want a max recursion depth)
-                return luup_agent_generate(agent, tool_results.c_str());
+                return generate_response(agent, tool_results.c_str(), out_length);
             }
         }
         
@@ -395,6 +449,9 @@ char* luup_agent_generate(luup_agent* agent, const char* user_message) {
         if (result) {
             memcpy(result, response.c_str(), response.size());
             result[response.size()] = '\0';
+            if (out_length) {
+                *out_length = response.size();
+            }
         }
         
         return result;
@@ -405,6 +462,133 @@ char* luup_agent_generate(luup_agent* agent, const char* user_message) {
     }
 }
 
+char* luup_agent_generate(luup_agent* agent, const char* user_message) {
+    return generate_response(agent, user_message, nullptr);
+}
+
+char* luup_agent_generate_ex(luup_agent* agent, const char* user_message, size_t* out_length) {
+    return generate_response(agent, user_message, out_length);
+}
+
+luup_error_t luup_agent_generate_batch(
+    luup_agent* agent,
+    const char** user_messages,
+    int n_messages,
+    char** responses)
+{
+    if (!agent || !user_messages || n_messages <= 0 || !responses) {
+        luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid parameters for generation");
+        return LUUP_ERROR_INVALID_PARAM;
+    }
+    
+    for (int i = 0; i < n_messages; i++) {
+        responses[i] = nullptr;
+        if (!user_messages[i]) {
+            luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid parameters for generation");
+            return LUUP_ERROR_INVALID_PARAM;
+        }
+    }
+    
+    // Upper bound on tool call/response rounds per message
+    const int max_tool_rounds = 5;
+    
+    try {
+        void* backend_data = luup_model_get_backend_data(agent->model);
+        if (!backend_data) {
+            luup_set_error(LUUP_ERROR_INVALID_PARAM, "Model backend not initialized");
+            return LUUP_ERROR_INVALID_PARAM;
+        }
+        
+        bool tools_active = agent->enable_tool_calling && !agent->tools.empty();
+        
+        std::vector<std::string> prompts(n_messages);
+        std::vector<size_t> pending(n_messages);
+        for (int i = 0; i < n_messages; i++) {
+            prompts[i] = build_turn_prompt(agent, user_messages[i]);
+            pending[i] = i;
+        }
+        
+        // Each round generates for every message still waiting on an answer.
+        // Messages whose output calls tools get the results appended to their
+        // prompt and go into the next round.
+        std::vector<std::string> results(n_messages);
+        for (int round = 0; !pending.empty(); round++) {
+            std::vector<std::string> round_prompts;
+            for (size_t idx : pending) {
+                round_prompts.push_back(prompts[idx]);
+            }
+            
+            std::vector<std::string> outputs;
+            if (luup_model_is_local(agent->model)) {
+                if (!llama_backend_generate_batch(backend_data, round_prompts,
+                                                  agent->temperature, agent->max_tokens,
+                                                  outputs)) {
+                    return luup_get_last_error_code();
+                }
+            } else {
+                // Remote APIs take one prompt per request
+                for (const auto& prompt : round_prompts) {
+                    char* response_raw = openai_backend_generate(
+                        backend_data,
+                        prompt.c_str(),
+                        agent->temperature,
+                        agent->max_tokens
+                    );
+                    if (!response_raw) {
+                        return luup_get_last_error_code();
+                    }
+                    outputs.push_back(response_raw);
+                    free(response_raw);
+                }
+            }
+            
+            std::vector<size_t> next;
+            for (size_t k = 0; k < pending.size(); k++) {
+                size_t idx = pending[k];
+                const std::string& output = outputs[k];
+                
+                std::vector<ToolCall> tool_calls;
+                if (tools_active && round < max_tool_rounds) {
+                    tool_calls = parse_tool_calls(output);
+                }
+                if (tool_calls.empty()) {
+                    results[idx] = output;
+                    continue;
+                }
+                
+                std::string tool_results;
+                for (const auto& tc : tool_calls) {
+                    std::string result = execute_tool(tc.tool_name, tc.parameters_json, agent->tools);
+                    tool_results += format_tool_result(tc.tool_name, result) + "\n";
+                }
+                prompts[idx] += output + "\n\nUser: " + tool_results + "\n\nAssistant: ";
+                next.push_back(idx);
+            }
+            pending.swap(next);
+        }
+        
+        // Allocate and return results
+        for (int i = 0; i < n_messages; i++) {
+            responses[i] = static_cast<char*>(malloc(results[i].size() + 1));
+            if (!responses[i]) {
+                for (int j = 0; j < i; j++) {
+                    free(responses[j]);
+                    responses[j] = nullptr;
+                }
+                luup_set_error(LUUP_ERROR_OUT_OF_MEMORY, "Failed to allocate responses");
+                return LUUP_ERROR_OUT_OF_MEMORY;
+            }
+            memcpy(responses[i], results[i].c_str(), results[i].size() + 1);
+        }
+        
+        return LUUP_SUCCESS;
+        
+    } catch (const std::exception& e) {
+        luup_set_error(LUUP_ERROR_INFERENCE_FAILED, e.what());
+        return LUUP_ERROR_INFERENCE_FAILED;
+    }
+}
+
 luup_error_t luup_agent_add_message(
     luup_agent* agent,
     const char* role,
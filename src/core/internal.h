@@ -24,13 +24,22 @@ extern luup_error_t luup_get_last_error_code();
 
 // llama.cpp backend functions
 extern void* llama_backend_init(const char* model_path, int gpu_layers, 
-                                int context_size, int threads);
+                                int context_size, int threads, int n_batch,
+                                bool lock_memory);
 extern void llama_backend_free(void* backend_data);
 extern bool llama_backend_get_info(void* backend_data, const char** device,
                                    int* gpu_layers, size_t* memory_usage);
-extern bool llama_backend_warmup(void* backend_data);
+extern bool llama_backend_warmup(void* backend_data, int n_tokens);
 extern char* llama_backend_generate(void* backend_data, const char* prompt,
                                     float temperature, int max_tokens);
+extern char* llama_backend_generate_stream(void* backend_data, const char* prompt,
+                                           float temperature, int max_tokens,
+                                           void (*callback)(const char* token, void* user_data),
+                                           void* user_data);
+extern bool llama_backend_generate_batch(void* backend_data,
+                                         const std::vector<std::string>& prompts,
+                                         float temperature, int max_tokens,
+                                         std::vector<std::string>& responses);
 
 // OpenAI-compatible remote API backend functions
 extern void* openai_backend_init(const char* api_endpoint, const char* api_key,
@@ -43,7 +52,7 @@ extern char* openai_backend_generate(void* backend_data, const char* prompt,
 extern bool openai_backend_generate_stream(void* backend_data, const char* prompt,
                                            float temperature, int max_tokens,
                                            void (*callback)(const char* token, void* user_data),
-                                           void* user_data);
+                                           void* user_data, bool* out_streamed = nullptr);
 
 // Model helper functions
 extern void* luup_model_get_backend_data(luup_model* model);
@@ -16,6 +16,8 @@ struct luup_model {
     int gpu_layers;
     int context_size;
     int threads;
+    int n_batch;
+    bool lock_memory;
     std::string api_key;
     std::string api_base_url;
     bool is_local;
@@ -28,8 +30,8 @@ struct luup_model {
     int gpu_layers_loaded;
     size_t memory_usage;
     
-    luup_model() : gpu_layers(-1), context_size(2048), threads(0), 
-                   is_local(true), backend_data(nullptr),
+    luup_model() : gpu_layers(-1), context_size(2048), threads(0), n_batch(0),
+                   lock_memory(false), is_local(true), backend_data(nullptr),
                    gpu_layers_loaded(0), memory_usage(0) {}
     
     ~luup_model() {
@@ -57,6 +59,8 @@ luup_model* luup_model_create_local(const luup_model_config* config) {
         model->gpu_layers = config->gpu_layers;
         model->context_size = config->context_size > 0 ? config->context_size : 2048;
         model->threads = config->threads;
+        model->n_batch = config->n_batch;
+        model->lock_memory = config->lock_memory;
         model->is_local = true;
         
         // Initialize llama.cpp backend
@@ -64,7 +68,9 @@ luup_model* luup_model_create_local(const luup_model_config* config) {
             config->path,
             config->gpu_layers,
             model->context_size,
-            model->threads
+            model->threads,
+            model->n_batch,
+            model->lock_memory
         );
         
         if (!model->backend_data) {
@@ -136,11 +142,20 @@ luup_model* luup_model_create_remote(const luup_model_config* config) {
 }
 
 luup_error_t luup_model_warmup(luup_model* model) {
+    return luup_model_warmup_ex(model, 32);
+}
+
+luup_error_t luup_model_warmup_ex(luup_model* model, int n_tokens) {
     if (!model) {
         luup_set_error(LUUP_ERROR_INVALID_PARAM, "Invalid model handle");
         return LUUP_ERROR_INVALID_PARAM;
     }
     
+    if (n_tokens <= 0) {
+        luup_set_error(LUUP_ERROR_INVALID_PARAM, "Warmup token count must be positive");
+        return LUUP_ERROR_INVALID_PARAM;
+    }
+    
     if (!model->backend_data) {
         luup_set_error(LUUP_ERROR_INVALID_PARAM, "Model backend not initialized");
         return LUUP_ERROR_INVALID_PARAM;
@@ -148,7 +163,7 @@ luup_error_t luup_model_warmup(luup_model* model) {
     
     if (model->is_local) {
         // Run warmup inference using llama.cpp backend
-        if (!llama_backend_warmup(model->backend_data)) {
+        if (!llama_backend_warmup(model->backend_data, n_tokens)) {
             // Error already set by llama_backend_warmup
             return LUUP_ERROR_INFERENCE_FAILED;
         }
@@ -189,6 +204,19 @@ void luup_free_string(char* str) {
     }
 }
 
+char* luup_strdup(const char* str) {
+    if (!str) {
+        return nullptr;
+    }
+    
+    size_t len = strlen(str) + 1;
+    char* copy = static_cast<char*>(malloc(len));
+    if (copy) {
+        memcpy(copy, str, len);
+    }
+    return copy;
+}
+
 } // extern "C"
 
 // Helper function for internal use
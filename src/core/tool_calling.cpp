@@ -9,8 +9,8 @@
 #include <string>
 #include <vector>
 #include <map>
-#include <regex>
 #include <sstream>
+#include <utility>
 
 using json = nlohmann::json;
 
@@ -33,6 +33,100 @@ struct ToolCall {
     std::string parameters_json;
 };
 
+/**
+ * @brief Incremental scanner for JSON objects in free-form text
+ *
+ * Consumes one character at a time and tracks the offsets of the braces
+ * still open plus string/escape state, so braces inside string values
+ * never end an object early. feed() returns true on each character that
+ * closes a brace; closed_start() is then the offset of the brace it
+ * matched, and the span between them is balanced.
+ */
+class JsonObjectScanner {
+public:
+    enum class State { START, IN_OBJECT, IN_STRING, ESCAPE };
+
+    /**
+     * @brief Advance the scanner by one character
+     *
+     * @param c Next character of the output
+     * @param pos Offset of c in the output
+     * @return true if c closed a brace
+     */
+    bool feed(char c, size_t pos) {
+        switch (state_) {
+            case State::START:
+                if (c == '{') {
+                    open_.push_back(pos);
+                    state_ = State::IN_OBJECT;
+                }
+                return false;
+            case State::IN_OBJECT:
+                if (c == '"') {
+                    state_ = State::IN_STRING;
+                } else if (c == '{') {
+                    open_.push_back(pos);
+                } else if (c == '}') {
+                    closed_start_ = open_.back();
+                    open_.pop_back();
+                    if (open_.empty()) {
+                        state_ = State::START;
+                    }
+                    return true;
+                }
+                return false;
+            case State::IN_STRING:
+                if (c == '\\') {
+                    state_ = State::ESCAPE;
+                } else if (c == '"') {
+                    state_ = State::IN_OBJECT;
+                }
+                return false;
+            case State::ESCAPE:
+                state_ = State::IN_STRING;
+                return false;
+        }
+        return false;
+    }
+
+    /**
+     * @brief Offset of the brace matched by the last closing brace
+     */
+    size_t closed_start() const { return closed_start_; }
+
+private:
+    State state_ = State::START;
+    std::vector<size_t> open_;
+    size_t closed_start_ = 0;
+};
+
+/**
+ * @brief Extract tool calls from a single parsed JSON object
+ *
+ * @param j Parsed JSON object
+ * @param tool_calls Output vector to append to
+ */
+static void collect_tool_calls(const json& j, std::vector<ToolCall>& tool_calls) {
+    // Check if this is a tool call structure
+    if (j.contains("tool_calls") && j["tool_calls"].is_array()) {
+        for (const auto& call : j["tool_calls"]) {
+            if (call.is_object() && call.contains("name") && call.contains("parameters")) {
+                ToolCall tc;
+                tc.tool_name = call["name"].get<std::string>();
+                tc.parameters_json = call["parameters"].dump();
+                tool_calls.push_back(tc);
+            }
+        }
+    }
+    // Also support direct tool call format
+    else if (j.contains("name") && j.contains("parameters")) {
+        ToolCall tc;
+        tc.tool_name = j["name"].get<std::string>();
+        tc.parameters_json = j["parameters"].dump();
+        tool_calls.push_back(tc);
+    }
+}
+
 /**
  * @brief Parse tool calls from LLM output
  * 
@@ -48,54 +142,40 @@ struct ToolCall {
  * }
  * ```
  * 
+ * The output is scanned once with JsonObjectScanner. Every balanced
+ * object that isn't nested inside another balanced one (fenced or not)
+ * is parsed exactly once; a stray '{' that is never closed doesn't hide
+ * the objects after it. Spans enclosed by a later object are dropped as
+ * it closes, so no span is re-scanned and the scan stays linear however
+ * many braces are left open.
+ * 
  * @param text LLM output text
  * @return Vector of parsed tool calls
  */
 std::vector<ToolCall> parse_tool_calls(const std::string& text) {
-    std::vector<ToolCall> tool_calls;
+    // Half-open [begin, end) spans of balanced objects, in order
+    std::vector<std::pair<size_t, size_t>> spans;
+    JsonObjectScanner scanner;
     
-    try {
-        // Try to find JSON blocks in the output
-        // Look for patterns like ```json ... ``` or just raw JSON
-        std::regex json_block_regex(R"(```(?:json)?\s*(\{[\s\S]*?\})\s*```|\{[\s\S]*?\})");
-        std::smatch match;
-        std::string search_text = text;
-        
-        while (std::regex_search(search_text, match, json_block_regex)) {
-            std::string json_str = match[1].str();
-            if (json_str.empty()) {
-                json_str = match[0].str();
-            }
-            
-            try {
-                json j = json::parse(json_str);
-                
-                // Check if this is a tool call structure
-                if (j.contains("tool_calls") && j["tool_calls"].is_array()) {
-                    for (const auto& call : j["tool_calls"]) {
-                        if (call.contains("name") && call.contains("parameters")) {
-                            ToolCall tc;
-                            tc.tool_name = call["name"].get<std::string>();
-                            tc.parameters_json = call["parameters"].dump();
-                            tool_calls.push_back(tc);
-                        }
-                    }
-                }
-                // Also support direct tool call format
-                else if (j.contains("name") && j.contains("parameters")) {
-                    ToolCall tc;
-                    tc.tool_name = j["name"].get<std::string>();
-                    tc.parameters_json = j["parameters"].dump();
-                    tool_calls.push_back(tc);
-                }
-            } catch (const json::exception&) {
-                // Not valid JSON, continue searching
-            }
-            
-            search_text = match.suffix().str();
+    for (size_t i = 0; i < text.size(); i++) {
+        if (!scanner.feed(text[i], i)) {
+            continue;
+        }
+        size_t start = scanner.closed_start();
+        while (!spans.empty() && spans.back().first > start) {
+            spans.pop_back();  // Nested inside the object just closed
+        }
+        spans.emplace_back(start, i + 1);
+    }
+    
+    std::vector<ToolCall> tool_calls;
+    for (const auto& span : spans) {
+        try {
+            json j = json::parse(text.begin() + span.first, text.begin() + span.second);
+            collect_tool_calls(j, tool_calls);
+        } catch (const json::exception&) {
+            // Not valid JSON (or unexpected field types), skip it
         }
-    } catch (const std::exception&) {
-        // Error parsing, return empty list
     }
     
     return tool_calls;
@@ -193,6 +193,14 @@ TEST_CASE("Agent generation", "[agent]") {
         REQUIRE(luup_get_last_error() != nullptr);
     }
     
+    SECTION("Generate with length and null agent") {
+        size_t length = 42;
+        char* response = luup_agent_generate_ex(nullptr, "test", &length);
+        REQUIRE(response == nullptr);
+        REQUIRE(length == 42);  // Untouched on error
+        REQUIRE(luup_get_last_error() != nullptr);
+    }
+    
     SECTION("Generate with null message") {
         luup_model* dummy_model = reinterpret_cast<luup_model*>(0x1);
         luup_agent_config config = {
@@ -213,6 +221,35 @@ TEST_CASE("Agent generation", "[agent]") {
         luup_agent_destroy(agent);
     }
     
+    SECTION("Batch generate with invalid parameters") {
+        luup_model* dummy_model = reinterpret_cast<luup_model*>(0x1);
+        luup_agent_config config = {
+            .model = dummy_model,
+            .system_prompt = "Test",
+            .temperature = 0.7f,
+            .max_tokens = 100,
+            .enable_tool_calling = false,
+            .enable_history_management = true
+        };
+        
+        luup_agent* agent = luup_agent_create(&config);
+        REQUIRE(agent != nullptr);
+        
+        const char* messages[] = {"first", nullptr};
+        char* responses[2] = {nullptr, nullptr};
+        
+        REQUIRE(luup_agent_generate_batch(nullptr, messages, 1, responses) == LUUP_ERROR_INVALID_PARAM);
+        REQUIRE(luup_agent_generate_batch(agent, messages, 0, responses) == LUUP_ERROR_INVALID_PARAM);
+        REQUIRE(luup_agent_generate_batch(agent, messages, 1, nullptr) == LUUP_ERROR_INVALID_PARAM);
+        
+        // A null entry is rejected before anything is generated
+        REQUIRE(luup_agent_generate_batch(agent, messages, 2, responses) == LUUP_ERROR_INVALID_PARAM);
+        REQUIRE(responses[0] == nullptr);
+        REQUIRE(responses[1] == nullptr);
+        
+        luup_agent_destroy(agent);
+    }
+    
     // Note: Full generation tests require a valid model
     // These would be integration tests with an actual GGUF file
 }
@@ -139,6 +139,11 @@ TEST_CASE("Model warmup", "[model]") {
         REQUIRE(result == LUUP_ERROR_INVALID_PARAM);
     }
     
+    SECTION("Null model with token count") {
+        luup_error_t result = luup_model_warmup_ex(nullptr, 32);
+        REQUIRE(result == LUUP_ERROR_INVALID_PARAM);
+    }
+    
     SECTION("Model without backend") {
         // Can't easily test this without creating a partially initialized model
         // This is more of an implementation detail